@@ -0,0 +1,246 @@
+import numpy as np
+from database import get_connection
+from profiling import instrumented
+from shards import ledger_files, map_files
+
+FETCH_BATCH_SIZE = 50000  # Rows copied from the cursor into the arrays at a time
+TYPE_CODES = {'income': 0, 'expense': 1}
+
+# SQL expressions turning the ISO 'date' column into day and month numbers (see LedgerColumns)
+DAY_NUMBER_SQL = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+MONTH_NUMBER_SQL = "(CAST(substr(date, 1, 4) AS INTEGER) - 1970) * 12 + CAST(substr(date, 6, 2) AS INTEGER) - 1"
+
+
+class LedgerColumns:
+    """
+    Columnar, compact copy of the ledger for vectorized reports.
+
+    Attributes:
+        amounts (np.ndarray): int64 amount of every transaction, in cents.
+        days (np.ndarray): int32 date as days since 1970-01-01.
+        months (np.ndarray): int32 calendar month as months since January 1970.
+        type_codes (np.ndarray): int8 code per row, see TYPE_CODES.
+        category_codes (np.ndarray): int32 category ID per row, an index into 'categories'.
+        categories (list): Category names, indexed by category ID (None for unused IDs).
+    """
+
+    def __init__(self, amounts, days, months, type_codes, category_codes, categories):
+        self.amounts = amounts
+        self.days = days
+        self.months = months
+        self.type_codes = type_codes
+        self.category_codes = category_codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def mask(self, trans_type=None):
+        # Boolean row mask for one transaction type (None selects every row)
+        if trans_type is None:
+            return np.ones(len(self), dtype=bool)
+        return self.type_codes == TYPE_CODES[trans_type]
+
+
+def date_range_clause(date_from=None, date_to=None):
+    """WHERE clause (or '') and parameters selecting transactions between two ISO dates, inclusive."""
+    where, params = [], []
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+    return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+
+def _names_by_id(conn, table):
+    # Names of a categories/accounts table as a list indexed by ID (None for unused IDs)
+    rows = conn.execute(f"SELECT id, name FROM {table}").fetchall()
+    names = [None] * (max((row[0] for row in rows), default=0) + 1)
+    for row_id, name in rows:
+        names[row_id] = name
+    return names
+
+
+def category_list(conn):
+    """Category names indexed by category ID (None for unused IDs), as LedgerColumns.categories."""
+    return _names_by_id(conn, 'categories')
+
+
+def account_list(conn):
+    """Account names indexed by account ID (None for unused IDs)."""
+    return _names_by_id(conn, 'accounts')
+
+
+@instrumented
+def load_columns(date_from=None, date_to=None, path=None):
+    """
+    Load transactions into a LedgerColumns, optionally limited to a date range.
+    The arrays are preallocated from a COUNT(*) and filled batch by batch, so no
+    per-row dicts are ever built. Dates are converted to day and month numbers by SQLite,
+    and the integer category IDs are used directly as category codes.
+
+    Args:
+        date_from (str, optional): First ISO date to include.
+        date_to (str, optional): Last ISO date to include.
+        path (str, optional): Ledger or shard file to read; defaults to the current ledger.
+
+    Returns:
+        LedgerColumns: The loaded columns.
+    """
+    where_sql, params = date_range_clause(date_from, date_to)
+    with get_connection(path) as conn:
+        count = conn.execute(f"SELECT COUNT(*) FROM transactions {where_sql}", params).fetchone()[0]
+        amounts = np.empty(count, dtype=np.int64)
+        days = np.empty(count, dtype=np.int32)
+        months = np.empty(count, dtype=np.int32)
+        type_codes = np.empty(count, dtype=np.int8)
+        category_codes = np.empty(count, dtype=np.int32)
+        categories = category_list(conn)
+
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Plain tuples; sqlite3.Row objects would dominate the load time
+        cursor.execute(f'''
+            SELECT amount_cents, {DAY_NUMBER_SQL}, {MONTH_NUMBER_SQL}, type = 'expense', category_id
+            FROM transactions {where_sql}
+        ''', params)
+        filled = 0
+        while filled < count:
+            batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not batch:
+                break
+            end = filled + len(batch)
+            batch_amounts, batch_days, batch_months, batch_types, batch_categories = zip(*batch)
+            amounts[filled:end] = batch_amounts
+            days[filled:end] = batch_days
+            months[filled:end] = batch_months
+            type_codes[filled:end] = batch_types
+            category_codes[filled:end] = batch_categories
+            filled = end
+
+    return LedgerColumns(
+        amounts[:filled], days[:filled], months[:filled], type_codes[:filled], category_codes[:filled], categories
+    )
+
+
+@instrumented
+def load_all_columns(date_from=None, date_to=None):
+    """
+    Like load_columns(), over the ledger and every shard file holding rows in the range.
+    The files are loaded in parallel and their arrays concatenated; category IDs are
+    the same in every shard, so the ledger's category list applies to all rows.
+    """
+    parts = map_files(lambda path: load_columns(date_from, date_to, path), ledger_files(date_from, date_to))
+    if len(parts) == 1:
+        return parts[0]
+    return LedgerColumns(
+        *(np.concatenate([getattr(part, name) for part in parts])
+          for name in ('amounts', 'days', 'months', 'type_codes', 'category_codes')),
+        parts[0].categories,
+    )
+
+
+@instrumented
+def category_totals(columns, trans_type='expense'):
+    """
+    Total amount per category with a single bincount.
+
+    Returns:
+        dict: Category name -> total in cents, only for categories that have rows.
+    """
+    mask = columns.mask(trans_type)
+    totals = _bincount_cents(columns.category_codes[mask], columns.amounts[mask], len(columns.categories))
+    counts = np.bincount(columns.category_codes[mask], minlength=len(columns.categories))
+    return {columns.categories[i]: int(totals[i]) for i in np.flatnonzero(counts)}
+
+
+def _bincount_cents(codes, cents, minlength):
+    # bincount sums weights as float64, which is exact for integer cents below 2**53;
+    # the result is converted back to int64
+    return np.rint(np.bincount(codes, weights=cents, minlength=minlength)).astype(np.int64)
+
+
+def _period_series(columns, periods, trans_type):
+    # Sum amounts per integer period number; returns (first_period, int64 totals array)
+    mask = columns.mask(trans_type)
+    if not len(periods):
+        return 0, np.zeros(0, dtype=np.int64)
+    first = int(periods.min())
+    totals = _bincount_cents(periods[mask] - first, columns.amounts[mask], int(periods.max()) - first + 1)
+    return first, totals
+
+
+def month_numbers(columns):
+    """Months since January 1970 for every row."""
+    return columns.months
+
+
+def week_numbers(columns):
+    """Weeks (starting Monday) since the week of 1970-01-01 for every row."""
+    return (columns.days + 3) // 7  # 1970-01-01 was a Thursday
+
+
+@instrumented
+def monthly_series(columns, trans_type='expense'):
+    """
+    Totals per calendar month, including empty months between the first and last row.
+
+    Returns:
+        tuple: (labels, totals) where labels are 'MM-YYYY' strings and totals an int64 array of cents.
+    """
+    first, totals = _period_series(columns, month_numbers(columns), trans_type)
+    months = np.arange(first, first + len(totals)).astype('datetime64[M]')
+    labels = [f"{str(m)[5:7]}-{str(m)[:4]}" for m in months]
+    return labels, totals
+
+
+@instrumented
+def weekly_series(columns, trans_type='expense'):
+    """
+    Totals per week (Monday to Sunday).
+
+    Returns:
+        tuple: (week_starts, totals) where week_starts is a datetime64[D] array.
+    """
+    first, totals = _period_series(columns, week_numbers(columns), trans_type)
+    week_starts = (np.arange(first, first + len(totals)) * 7 - 3).astype('datetime64[D]')
+    return week_starts, totals
+
+
+def rolling_average(values, window):
+    """
+    Trailing moving average using a cumulative sum (O(n) for any window size).
+    The first window-1 points average over the rows available so far.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    cumulative = np.cumsum(values)
+    result = cumulative.copy()
+    result[window:] = cumulative[window:] - cumulative[:-window]
+    divisors = np.minimum(np.arange(1, len(values) + 1), window)
+    return result / divisors
+
+
+@instrumented
+def income_expense_trend(columns, window=3):
+    """
+    Monthly income, expenses and net, plus a rolling average of the net.
+
+    Returns:
+        dict: 'labels' ('MM-YYYY'), 'income', 'expense', 'net' and 'net_average' arrays
+        in cents, all aligned on the same months.
+    """
+    months = month_numbers(columns)
+    first, income = _period_series(columns, months, 'income')
+    _, expense = _period_series(columns, months, 'expense')
+    net = income - expense
+    labels = [f"{str(m)[5:7]}-{str(m)[:4]}" for m in np.arange(first, first + len(net)).astype('datetime64[M]')]
+    return {
+        'labels': labels,
+        'income': income,
+        'expense': expense,
+        'net': net,
+        'net_average': rolling_average(net, window),
+    }
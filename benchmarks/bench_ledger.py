@@ -0,0 +1,280 @@
+"""
+Benchmark suite for database.py, MoneyManager, report generation and GUI refresh.
+
+Builds (or reuses) synthetic ledgers of each requested size, times every operation
+repeatedly and reports throughput, p50/p99 latency and peak Python memory.
+Results can be saved as JSON and compared against an earlier run, e.g. from
+another commit.
+
+Usage:
+    python benchmarks/bench_ledger.py [--sizes 1000 100000] [--json out.json] [--compare base.json]
+    python benchmarks/bench_ledger.py --sizes 10000000 --data-dir /tmp/ledgers
+
+Ledgers are cached in --data-dir as ledger_<rows>.db and rebuilt only with --rebuild.
+Operations that materialise the whole ledger are skipped above --full-scan-limit rows.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import database  # noqa: E402
+from money_manager import MoneyManager  # noqa: E402
+from synthetic_ledger import build_ledger, use_database  # noqa: E402
+
+DEFAULT_SIZES = (1000, 100000)
+DEFAULT_MIN_TIME = 0.5  # Seconds spent repeating each operation
+MAX_ITERATIONS = 1000
+PAGE_SIZE = 30  # Rows in one transaction log page
+SEARCH_FILTERS = {'text': 'sushi'}  # Full-text search for a name in the synthetic ledger
+FILTER_ONLY = {'type': 'expense', 'category': 'Travel', 'min_cents': 50000}
+
+
+def time_operation(fn, min_time=DEFAULT_MIN_TIME, setup=None):
+    """
+    Call fn() repeatedly for at least min_time seconds (3 calls minimum).
+    'setup' runs untimed before each call, e.g. to drop a cache.
+
+    Returns:
+        dict: Iterations, p50/p99 latency in ms, calls per second and the last result.
+    """
+    samples = []
+    result = None
+    deadline = time.perf_counter() + min_time
+    while len(samples) < 3 or (time.perf_counter() < deadline and len(samples) < MAX_ITERATIONS):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    p99_index = min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))
+    return {
+        'iterations': len(samples),
+        'p50_ms': statistics.median(samples) * 1000,
+        'p99_ms': samples[p99_index] * 1000,
+        'ops_per_sec': len(samples) / sum(samples),
+        'result': result,
+    }
+
+
+def peak_memory(fn, setup=None):
+    """Peak Python heap allocated while running fn() once, in MB (via tracemalloc)."""
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def rows_in(result):
+    # Rows produced by an operation, used for rows/second throughput
+    if isinstance(result, (list, dict)):
+        return len(result)
+    if hasattr(result, '__len__') and not isinstance(result, str):
+        return len(result)
+    return None
+
+
+def ledger_operations(size, full_scan_limit):
+    """
+    Build the list of (name, fn, setup) operations to time for a ledger of 'size' rows.
+    """
+    manager = MoneyManager(None)
+    middle_id = max(1, size // 2)
+    deep_offset = max(0, size - PAGE_SIZE)
+    first_page = database.fetch_transactions_page(PAGE_SIZE)
+    cursor = (first_page[-1]['date'], first_page[-1]['id']) if first_page else None
+
+    def write_roundtrip():
+        row = database.insert_transaction('expense', 1234, 'Benchmark', 'Benchmark')
+        database.delete_transaction_by_id(row['id'])
+
+    def manager_write_roundtrip():
+        manager.add_expense(1234, 'Benchmark', 'Benchmark')
+        newest = manager.get_transactions_page(1)[0]
+        manager.delete_transaction(newest['id'])
+
+    ops = [
+        ('db.count_transactions', database.count_transactions, None),
+        ('db.fetch_balance', database.fetch_balance, None),
+        ('db.fetch_expense_by_category', database.fetch_expense_by_category, None),
+        ('db.fetch_monthly_expenses', database.fetch_monthly_expenses, None),
+        ('db.fetch_transactions_page[first]', lambda: database.fetch_transactions_page(PAGE_SIZE), None),
+        ('db.fetch_transactions_page[deep offset]', lambda: database.fetch_transactions_page(PAGE_SIZE, deep_offset), None),
+        ('db.fetch_transactions_page[keyset]', lambda: database.fetch_transactions_page(PAGE_SIZE, after=cursor), None),
+        ('db.fetch_transactions_page[search]', lambda: database.fetch_transactions_page(PAGE_SIZE, filters=SEARCH_FILTERS), None),
+        ('db.count_transactions[filtered]', lambda: database.count_transactions(FILTER_ONLY), None),
+        ('db.fetch_transaction_by_id', lambda: database.fetch_transaction_by_id(middle_id), None),
+        ('db.insert+delete', write_roundtrip, None),
+        ('manager.get_balance[cold]', manager.get_balance, manager._reset_cache),
+        ('manager.get_balance[warm]', manager.get_balance, None),
+        ('manager.get_expense_by_category[cold]', manager.get_expense_by_category, manager._reset_cache),
+        ('manager.get_monthly_expenses[cold]', manager.get_monthly_expenses, manager._reset_cache),
+        ('manager.get_monthly_expenses[warm]', manager.get_monthly_expenses, None),
+        ('manager.add+delete', manager_write_roundtrip, None),
+        ('manager.poll_changes[idle]', manager.poll_changes, None),
+    ]
+    if size <= full_scan_limit:
+        ops.append(('db.fetch_transactions', database.fetch_transactions, None))
+        ops.append(('manager.get_transactions[cold]', manager.get_transactions, manager._reset_cache))
+
+    try:
+        import analytics
+        import exporter
+        import reports
+    except ImportError as e:
+        print(f"  (skipping report benchmarks: {e})")
+    else:
+        series = {}
+
+        def compute_series():
+            series['last'] = reports.compute_report_series()
+            return series['last']
+
+        def render_report():
+            fig = reports.build_report_figure(series['last'])
+            fig.savefig(io.BytesIO(), format='png')
+
+        snapshot_path = database.database_path() + ".snapshot"
+        exporter.export_snapshot(snapshot_path)
+
+        def export_csv():
+            with open(os.devnull, "w", newline="") as out:
+                return exporter.export_csv(out)
+
+        ops.append(('analytics.load_columns', analytics.load_columns, None))
+        ops.append(('exporter.load_snapshot', lambda: exporter.load_snapshot(snapshot_path), None))
+        ops.append(('reports.compute_report_series[snapshot]',
+                    lambda: reports.compute_report_series(snapshot=snapshot_path), None))
+        if size <= full_scan_limit:
+            ops.append(('exporter.export_csv', export_csv, None))
+        ops.append(('reports.compute_report_series', compute_series, None))
+        ops.append(('reports.render_png', render_report, None))
+
+    ops.extend(gui_operations())
+    return ops
+
+
+def gui_operations():
+    """Headless GUI refresh timings; empty if customtkinter or a display is unavailable."""
+    try:
+        import tkinter
+        from gui_app import MoneyManagerApp
+        app = MoneyManagerApp()
+    except (ImportError, tkinter.TclError) as e:
+        print(f"  (skipping GUI benchmarks: {e})")
+        return []
+
+    app.withdraw()  # Keep the window off screen
+
+    def refresh_log_page():
+        # The synchronous part of refresh_transaction_log: fetch one page and render it
+        app.log_rows = app.manager.get_transactions_page(app.log_page_size, 0)
+        app.log_offset = 0
+        app.log_total = app.manager.count_transactions()
+        app.render_transaction_log()
+        app.update_idletasks()
+
+    def close_app():
+        app.on_close()
+
+    refresh_log_page.close = close_app
+    return [('gui.refresh_transaction_log', refresh_log_page, None)]
+
+
+def run_size(size, args):
+    path = os.path.join(args.data_dir, f"ledger_{size}.db")
+    if args.rebuild or not os.path.exists(path):
+        print(f"Building {size:,}-row ledger at {path} ...")
+        start = time.perf_counter()
+        build_ledger(path, size)
+        print(f"  built in {time.perf_counter() - start:.1f}s")
+    use_database(path)
+    database.initialize_db()
+
+    results = {}
+    print(f"\n{size:,} rows")
+    print(f"  {'operation':44} {'p50 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'rows/s':>12} {'peak MB':>9}")
+    for name, fn, setup in ledger_operations(size, args.full_scan_limit):
+        timing = time_operation(fn, args.min_time, setup)
+        rows = rows_in(timing.pop('result'))
+        timing['rows_per_sec'] = rows * timing['ops_per_sec'] if rows else None
+        timing['peak_mb'] = peak_memory(fn, setup) if args.memory else None
+        results[name] = timing
+        rows_text = f"{timing['rows_per_sec']:12,.0f}" if timing['rows_per_sec'] else f"{'':12}"
+        peak_text = f"{timing['peak_mb']:9.2f}" if timing['peak_mb'] is not None else f"{'':9}"
+        print(f"  {name:44} {timing['p50_ms']:10.3f} {timing['p99_ms']:10.3f} "
+              f"{timing['ops_per_sec']:10,.0f} {rows_text} {peak_text}")
+        if hasattr(fn, 'close'):
+            fn.close()
+    database.close_connection()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print p50 ratios against a baseline JSON file (>1.0 means slower now)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (revision {baseline.get('revision')}); p50 now/before:")
+    for size, operations in results['sizes'].items():
+        before_ops = baseline.get('sizes', {}).get(size, {})
+        for name, timing in operations.items():
+            before = before_ops.get(name)
+            if not before:
+                continue
+            ratio = timing['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('inf')
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"  {int(size):>10,}  {name:44} {ratio:6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Ledger sizes in rows")
+    parser.add_argument("--data-dir", default=os.path.join(REPO_ROOT, "benchmarks", "data"),
+                        help="Where synthetic ledgers are kept")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate ledgers even if they exist")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="Seconds per operation")
+    parser.add_argument("--full-scan-limit", type=int, default=1000000,
+                        help="Skip whole-ledger fetches above this many rows")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip tracemalloc peak memory runs")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {'revision': git_revision(), 'python': sys.version.split()[0],
+               'sqlite': database.sqlite3.sqlite_version, 'sizes': {}}
+    for size in args.sizes:
+        results['sizes'][str(size)] = run_size(size, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Startup-time budget check for the Money Manager GUI.
+
+Runs 'python -X importtime -c "import gui_app"' in a fresh interpreter, reports the
+slowest imports, and fails if the total import time is over budget or if any
+module that should load on first use (matplotlib, numpy, report code) was pulled
+in at startup.
+
+Usage:
+    python benchmarks/startup_time.py [--budget-ms 400] [--runs 5] [--module gui_app] [--window]
+
+--window also times creating the main window and painting it once (needs a display).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 400
+
+# Modules that must not be imported until the user asks for them
+LAZY_MODULES = ("matplotlib", "numpy", "reports", "importer")
+
+
+def measure_imports(module):
+    """
+    Import 'module' in a fresh interpreter with -X importtime.
+
+    Returns:
+        list: (cumulative_us, self_us, module_name) for every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative_us), int(self_us), name.rstrip()))  # Indent marks nesting
+    return timings
+
+
+def measure_window():
+    """Time constructing MoneyManagerApp and painting the first frame, in seconds."""
+    sys.path.insert(0, REPO_ROOT)
+    start = time.perf_counter()
+    from gui_app import MoneyManagerApp
+    from database import initialize_db, close_connection
+    initialize_db()
+    app = MoneyManagerApp()
+    app.update()  # Process pending geometry and paint events
+    elapsed = time.perf_counter() - start
+    app.on_close()
+    close_connection()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum median import time")
+    parser.add_argument("--module", default="gui_app", help="Entry module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to measure")
+    parser.add_argument("--window", action="store_true", help="Also time first paint of the main window")
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        timings = measure_imports(args.module)
+        totals.append(sum(self_us for _, self_us, _ in timings) / 1000)
+
+    print("Slowest imports (cumulative ms, last run):")
+    top_level = [t for t in timings if not t[2][1:].startswith(" ")]
+    for cumulative_us, _, name in sorted(top_level, reverse=True)[:10]:
+        print(f"  {cumulative_us / 1000:8.1f}  {name.strip()}")
+
+    median_ms = statistics.median(totals)
+    print(f"\nImport time: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    loaded = {name.strip().split(".")[0] for _, _, name in timings}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"FAIL: loaded at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("FAIL: import time is over budget")
+        failed = True
+
+    if args.window:
+        print(f"First paint: {measure_window() * 1000:.1f} ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
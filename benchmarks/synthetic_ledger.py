@@ -0,0 +1,140 @@
+"""
+Synthetic ledger generator for benchmarks.
+
+Builds a SQLite ledger with a realistic mix of transactions: a biweekly salary,
+monthly rent and bills, frequent groceries/dining/transport purchases with
+log-normal amounts, and occasional large one-off expenses, spread over several years.
+
+Usage:
+    python benchmarks/synthetic_ledger.py ROWS PATH [--years 5] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+from itertools import islice
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import database  # noqa: E402
+
+GENERATE_CHUNK_SIZE = 20000
+
+# (category, names, weight, median amount, spread) for everyday expenses
+EXPENSE_PROFILES = (
+    ("Groceries", ("Supermarket", "Farmers Market", "Corner Store"), 30, 45.0, 0.6),
+    ("Dining", ("Cafe", "Pizza Place", "Sushi Bar", "Food Truck"), 25, 18.0, 0.7),
+    ("Transport", ("Gas Station", "Metro Card", "Ride Share", "Parking"), 15, 25.0, 0.6),
+    ("Shopping", ("Online Store", "Bookshop", "Clothing Store"), 10, 60.0, 0.9),
+    ("Entertainment", ("Cinema", "Concert", "Streaming"), 8, 20.0, 0.8),
+    ("Health", ("Pharmacy", "Dentist", "Gym"), 5, 40.0, 0.8),
+    ("Travel", ("Airline", "Hotel", "Car Rental"), 2, 400.0, 0.8),
+)
+# (category, name, amount, day of month) for monthly bills
+MONTHLY_BILLS = (
+    ("Housing", "Rent", 1450.00, 1),
+    ("Utilities", "Electric Company", 85.00, 12),
+    ("Utilities", "Internet Provider", 60.00, 15),
+    ("Insurance", "Car Insurance", 120.00, 20),
+)
+SALARY = ("Salary", "Employer Payroll", 2350.00)  # Paid every other Friday
+
+
+def generate_rows(count, years=5, seed=42, end=None):
+    """
+    Yield 'count' transactions as (type, amount_cents, name, category, date) tuples in
+    chronological order, ready for database.insert_transactions().
+    Fixed income and bills follow the calendar; the remaining rows are everyday
+    purchases distributed evenly over the period.
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=365 * years)
+    total_days = (end - start).days + 1
+
+    # Calendar-driven rows take a small share of the ledger
+    fixed_per_day = (len(MONTHLY_BILLS) / 30.4) + (1 / 14)
+    fixed_enabled = count >= total_days * fixed_per_day * 2
+    purchases = count - (int(total_days * fixed_per_day) if fixed_enabled else 0)
+    per_day = max(purchases, 0) / total_days
+
+    weights = [profile[2] for profile in EXPENSE_PROFILES]
+    produced = 0
+    carry = 0.0
+    for offset in range(total_days):
+        day = start + timedelta(days=offset)
+        iso_day = day.isoformat()
+        if fixed_enabled:
+            if day.weekday() == 4 and (offset // 7) % 2 == 0:
+                yield ('income', round(SALARY[2] * 100), SALARY[1], SALARY[0], iso_day)
+                produced += 1
+            for category, name, amount, day_of_month in MONTHLY_BILLS:
+                if day.day == day_of_month:
+                    yield ('expense', round(amount * 100), name, category, iso_day)
+                    produced += 1
+        carry += per_day
+        todays = int(carry)
+        carry -= todays
+        for profile in rng.choices(EXPENSE_PROFILES, weights, k=todays):
+            category, names, _, median, spread = profile
+            cents = round(rng.lognormvariate(0, spread) * median * 100) or 1
+            yield ('expense', cents, rng.choice(names), category, iso_day)
+            produced += 1
+        if produced >= count:
+            return
+
+    # Top up rounding shortfall on the last day
+    while produced < count:
+        yield ('expense', 999, "Corner Store", "Groceries", end.isoformat())
+        produced += 1
+
+
+def build_ledger(path, count, years=5, seed=42, progress=None):
+    """
+    Create a fresh ledger database at 'path' with 'count' synthetic transactions.
+    Leaves the database module pointing at the new file.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    use_database(path)
+    database.initialize_db()
+    rows = islice(generate_rows(count, years, seed), count)
+    inserted = 0
+    with database.get_connection():  # One transaction for the whole ledger
+        while True:
+            chunk = list(islice(rows, GENERATE_CHUNK_SIZE))
+            if not chunk:
+                break
+            database.insert_transactions(chunk)
+            inserted += len(chunk)
+            if progress:
+                progress(inserted, count)
+    return inserted
+
+
+def use_database(path):
+    """Point database.py at another SQLite file, closing the pooled connection."""
+    database.set_database(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int, help="Number of transactions to generate")
+    parser.add_argument("path", help="SQLite file to create (overwritten)")
+    parser.add_argument("--years", type=int, default=5, help="Years of history")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    def progress(done, total):
+        print(f"\r{done:,}/{total:,} rows", end="", flush=True)
+
+    build_ledger(args.path, args.rows, args.years, args.seed, progress)
+    database.close_connection()
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Headless command line for Money Manager: no Tk is imported, so it runs from cron
+or on servers without a display. Shares database.py and MoneyManager with the GUI.
+
+Usage:
+    python -m money_manager balance [--json] [--account NAME | --by-account]
+    python -m money_manager import STATEMENT.csv|.ofx|.qfx [--account NAME]
+    python -m money_manager export [--format csv|json|jsonl|snapshot] [--output FILE] [--from DATE] [--to DATE] [filters]
+    python -m money_manager report [--format csv|json] [--table monthly|categories] [--chart FILE.png] [--snapshot FILE]
+    python -m money_manager accounts [--add NAME]
+    python -m money_manager shard [--year YEAR] [--account NAME]
+    python -m money_manager recurring [--add NAME --amount X --category C [--frequency F] ...] [--delete ID] [--post]
+    python -m money_manager budget [--set CATEGORY LIMIT | --remove CATEGORY]
+    python -m money_manager forecast [--months N] [--json]
+
+All commands accept --db PATH to use another ledger file. Output goes to stdout unless
+--output is given; progress and errors go to stderr. Balances and reports include rows
+moved to shard files; exports cover the live ledger (use --db SHARD to export a shard).
+"""
+import argparse
+import csv
+import json
+import sys
+import database
+import exporter
+from forecast import FREQUENCIES, FORECAST_MONTHS
+from money import format_cents, to_cents
+from money_manager import MoneyManager
+
+
+def open_output(path):
+    # stdout unless a file is given; the caller closes files only
+    if not path or path == "-":
+        return sys.stdout
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def read_filters(args):
+    """Build a filters dict (see database._filter_clause) from the command-line options."""
+    filters = {
+        'text': args.search,
+        'type': args.type,
+        'category': args.category,
+        'account': args.account,
+        'min_cents': to_cents(args.min_amount) if args.min_amount is not None else None,
+        'max_cents': to_cents(args.max_amount) if args.max_amount is not None else None,
+        'date_from': args.date_from,
+        'date_to': args.date_to,
+    }
+    return {key: value for key, value in filters.items() if value is not None}
+
+
+def cmd_balance(args, manager):
+    if args.by_account:
+        balances = manager.get_account_balances()
+        if args.json:
+            json.dump({'accounts': balances, 'balance_cents': sum(balances.values())}, sys.stdout)
+            sys.stdout.write("\n")
+        else:
+            for account, cents in balances.items():
+                print(f"{account}\t{format_cents(cents)}")
+        return 0
+    if args.account:
+        balances = manager.get_account_balances()
+        if args.account not in balances:
+            raise ValueError(f"Unknown account: {args.account}")
+        balance = balances[args.account]
+    else:
+        balance = manager.get_balance()
+    if args.json:
+        json.dump({'balance_cents': balance, 'balance': format_cents(balance)}, sys.stdout)
+        sys.stdout.write("\n")
+    else:
+        print(format_cents(balance))
+    return 0
+
+
+def cmd_import(args, manager):
+    def progress(rows_imported, fraction_done):
+        print(f"\r{rows_imported:,} rows ({fraction_done:.0%})", end="", file=sys.stderr, flush=True)
+
+    imported, skipped = manager.import_file(args.path, progress, args.account)
+    print(file=sys.stderr)
+    print(f"Imported {imported:,} transactions, skipped {skipped:,} rows.")
+    return 0
+
+
+EXPORTERS = {
+    'csv': exporter.export_csv,
+    'json': exporter.export_json,
+    'jsonl': exporter.export_jsonl,
+}
+
+
+def cmd_export(args, manager):
+    filters = read_filters(args)
+    if args.format == "snapshot":
+        if not args.output or args.output == "-":
+            raise ValueError("A snapshot needs an output file (--output).")
+        if set(filters) - {'date_from', 'date_to'}:
+            raise ValueError("A snapshot can only be limited by date (--from/--to).")
+        written = exporter.export_snapshot(args.output, args.date_from, args.date_to, args.batch_size)
+    else:
+        out = open_output(args.output)
+        try:
+            written = EXPORTERS[args.format](out, filters, args.batch_size)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    print(f"Exported {written:,} transactions.", file=sys.stderr)
+    return 0
+
+
+def cmd_report(args, manager):
+    from reports import compute_report_series, build_report_figure  # matplotlib via the Agg canvas only
+
+    series = compute_report_series(args.date_from, args.date_to, args.snapshot, manager.get_forecast())
+    trend = series['trend']
+    monthly = [
+        {
+            'month': label,
+            'income_cents': int(trend['income'][i]),
+            'expense_cents': int(trend['expense'][i]),
+            'net_cents': int(trend['net'][i]),
+        }
+        for i, label in enumerate(trend['labels'])
+    ]
+    out = open_output(args.output)
+    try:
+        if args.format == "json":
+            json.dump({
+                'date_from': args.date_from,
+                'date_to': args.date_to,
+                'balance_cents': manager.get_balance(),
+                'categories': series['categories'],
+                'monthly': monthly,
+                'forecast': [
+                    {'month': label, 'balance_cents': cents}
+                    for label, cents in zip(series['forecast']['labels'], series['forecast']['balance'])
+                ],
+            }, out, indent=2)
+            out.write("\n")
+        elif args.table == "categories":
+            writer = csv.writer(out)
+            writer.writerow(("category", "expense"))
+            for category, cents in sorted(series['categories'].items(), key=lambda item: -item[1]):
+                writer.writerow((category, format_cents(cents, symbol=False, grouping=False)))
+        else:
+            writer = csv.writer(out)
+            writer.writerow(("month", "income", "expense", "net"))
+            for row in monthly:
+                writer.writerow((row['month'], *(
+                    format_cents(row[key], symbol=False, grouping=False)
+                    for key in ('income_cents', 'expense_cents', 'net_cents')
+                )))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.chart:
+        build_report_figure(series).savefig(args.chart, dpi=args.dpi)
+        print(f"Chart written to {args.chart}", file=sys.stderr)
+    return 0
+
+
+def cmd_accounts(args, manager):
+    if args.add:
+        if not manager.add_account(args.add):
+            raise ValueError(f"Account already exists: {args.add}")
+    for account, cents in manager.get_account_balances().items():
+        print(f"{account}\t{format_cents(cents)}")
+    return 0
+
+
+def cmd_shard(args, manager):
+    if args.year is not None or args.account:
+        shard = manager.shard(args.year, args.account)
+        print(f"Moved {shard['rows']:,} transactions to {shard['path']}", file=sys.stderr)
+    for shard in manager.get_shards():
+        label = " ".join(part for part in (shard['account'], shard['year']) if part)
+        print(f"{shard['path']}\t{label}\t{shard['rows']:,} rows\t{shard['first_date']} to {shard['last_date']}")
+    return 0
+
+
+def cmd_recurring(args, manager):
+    if args.add:
+        if args.amount is None or not args.category:
+            raise ValueError("--add needs --amount and --category.")
+        amount = to_cents(args.amount)
+        if amount <= 0:
+            raise ValueError("Amount must be greater than zero.")
+        manager.add_recurring(
+            args.type, amount, args.add, args.category, args.frequency, args.start, args.end, args.account
+        )
+    if args.delete is not None and not manager.delete_recurring(args.delete):
+        raise ValueError(f"No recurring transaction with ID {args.delete}")
+    if args.post:
+        print(f"Posted {manager.post_recurring():,} transactions.", file=sys.stderr)
+    for rule in manager.get_recurring():
+        sign = "" if rule['type'] == 'income' else "-"
+        end = f" until {rule['end_date']}" if rule['end_date'] else ""
+        print(f"{rule['id']}\t{rule['name']}\t{sign}{format_cents(rule['amount_cents'])}\t{rule['frequency']}{end}"
+              f"\t{rule['category']}\t{rule['account']}\tnext {rule['next_date']}")
+    return 0
+
+
+def cmd_budget(args, manager):
+    if args.set:
+        category, limit = args.set
+        manager.set_budget(category, to_cents(limit))
+    if args.remove:
+        manager.set_budget(args.remove, None)
+    alerts = {alert['category'] for alert in manager.budget_alerts()}
+    for budget in manager.budget_status():
+        flag = "\t!" if budget['category'] in alerts else ""
+        print(f"{budget['category']}\t{format_cents(budget['spent_cents'])}\tof {format_cents(budget['limit_cents'])}{flag}")
+    return 0
+
+
+def cmd_forecast(args, manager):
+    forecast = manager.get_forecast(args.months)
+    if args.json:
+        json.dump([
+            {'month': label, 'balance_cents': cents} for label, cents in zip(forecast['labels'], forecast['balance'])
+        ], sys.stdout)
+        sys.stdout.write("\n")
+    else:
+        for label, cents in zip(forecast['labels'], forecast['balance']):
+            print(f"{label}\t{format_cents(cents)}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m money_manager", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", help=f"Ledger database file (default: {database.DEFAULT_DB_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    balance = commands.add_parser("balance", help="Print the current balance")
+    balance.add_argument("--json", action="store_true", help="Print as JSON")
+    balance.add_argument("--account", help="Balance of this account only")
+    balance.add_argument("--by-account", action="store_true", help="Balance of every account")
+    balance.set_defaults(run=cmd_balance)
+
+    statement = commands.add_parser("import", help="Import a CSV or OFX/QFX bank statement")
+    statement.add_argument("path")
+    statement.add_argument("--account", default=database.DEFAULT_ACCOUNT,
+                           help="Account the statement belongs to (created if new)")
+    statement.set_defaults(run=cmd_import)
+
+    export = commands.add_parser(
+        "export", help="Stream transactions as CSV, JSON or JSON Lines, or write a binary snapshot, oldest first"
+    )
+    export.add_argument("--format", choices=("csv", "json", "jsonl", "snapshot"), default="csv",
+                        help="'snapshot' writes a memory-mappable columnar file for 'report --snapshot'")
+    export.add_argument("--batch-size", type=int, default=exporter.EXPORT_BATCH_SIZE,
+                        help="Rows read from the database at a time")
+    export.add_argument("--output", "-o", help="Write to this file instead of stdout")
+    export.add_argument("--from", dest="date_from", help="First date to include (YYYY-MM-DD)")
+    export.add_argument("--to", dest="date_to", help="Last date to include (YYYY-MM-DD)")
+    export.add_argument("--search", help="Only rows whose name or category matches this text")
+    export.add_argument("--type", choices=("income", "expense"))
+    export.add_argument("--category")
+    export.add_argument("--account")
+    export.add_argument("--min-amount", help="Smallest amount to include, in dollars")
+    export.add_argument("--max-amount", help="Largest amount to include, in dollars")
+    export.set_defaults(run=cmd_export)
+
+    report = commands.add_parser("report", help="Summarise the ledger and optionally render the charts")
+    report.add_argument("--format", choices=("csv", "json"), default="csv")
+    report.add_argument("--table", choices=("monthly", "categories"), default="monthly",
+                        help="Which table to print in CSV format")
+    report.add_argument("--output", "-o", help="Write to this file instead of stdout")
+    report.add_argument("--from", dest="date_from", help="First date to include (YYYY-MM-DD)")
+    report.add_argument("--to", dest="date_to", help="Last date to include (YYYY-MM-DD)")
+    report.add_argument("--chart", help="Also render the report charts to this image file (e.g. report.png)")
+    report.add_argument("--dpi", type=int, default=100)
+    report.add_argument("--snapshot", help="Report from a snapshot file (see 'export --format snapshot') "
+                                           "instead of the database")
+    report.set_defaults(run=cmd_report)
+
+    accounts = commands.add_parser("accounts", help="List the accounts and their balances")
+    accounts.add_argument("--add", metavar="NAME", help="Create an account first")
+    accounts.set_defaults(run=cmd_accounts)
+
+    shard = commands.add_parser(
+        "shard", help="Move a year and/or an account into a separate file, or list the shard files"
+    )
+    shard.add_argument("--year", type=int, help="Calendar year to move")
+    shard.add_argument("--account", help="Account to move")
+    shard.set_defaults(run=cmd_shard)
+
+    recurring = commands.add_parser(
+        "recurring", help="List, add or delete recurring transactions, or post the ones that are due"
+    )
+    recurring.add_argument("--add", metavar="NAME", help="Add a recurring transaction with this name")
+    recurring.add_argument("--amount", help="Amount of every occurrence, in dollars")
+    recurring.add_argument("--category")
+    recurring.add_argument("--type", choices=("income", "expense"), default="expense")
+    recurring.add_argument("--frequency", choices=tuple(FREQUENCIES), default="monthly")
+    recurring.add_argument("--start", help="First date (YYYY-MM-DD, default: today)")
+    recurring.add_argument("--end", help="Last date (YYYY-MM-DD)")
+    recurring.add_argument("--account", default=database.DEFAULT_ACCOUNT)
+    recurring.add_argument("--delete", type=int, metavar="ID", help="Delete a recurring transaction")
+    recurring.add_argument("--post", action="store_true", help="Post the occurrences due by today")
+    recurring.set_defaults(run=cmd_recurring)
+
+    budget = commands.add_parser("budget", help="Show this month's spending against the category budgets")
+    budget.add_argument("--set", nargs=2, metavar=("CATEGORY", "LIMIT"), help="Set a monthly limit, in dollars")
+    budget.add_argument("--remove", metavar="CATEGORY", help="Remove a category's budget")
+    budget.set_defaults(run=cmd_budget)
+
+    forecast = commands.add_parser(
+        "forecast", help="Project the month-end balance from the recurring transactions"
+    )
+    forecast.add_argument("--months", type=int, default=FORECAST_MONTHS)
+    forecast.add_argument("--json", action="store_true", help="Print as JSON")
+    forecast.set_defaults(run=cmd_forecast)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        database.set_database(args.db)
+    try:
+        database.initialize_db()
+        return args.run(args, MoneyManager())
+    except BrokenPipeError:
+        return 0  # e.g. piped into 'head'
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
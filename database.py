@@ -1,79 +1,1009 @@
+import functools
+import inspect
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+import profiling
+from profiling import instrumented
+
+DEFAULT_DB_NAME = "money_manager.db"
+
+# Pragmas applied once to every pooled connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",      # Readers don't block the writer, commits append to the WAL
+    "PRAGMA synchronous = NORMAL",    # fsync at checkpoints instead of on every commit (safe with WAL)
+    "PRAGMA cache_size = -20000",     # ~20 MB page cache
+    "PRAGMA mmap_size = 268435456",   # Memory-map up to 256 MB of the database file
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Several processes (two windows, the GUI and an import script) may share a ledger file.
+# A writer waits up to BUSY_TIMEOUT_SECONDS for another one's lock; write functions that
+# still fail with "database is locked" are retried a few times, see _retry_when_busy().
+BUSY_TIMEOUT_SECONDS = 5.0
+BUSY_RETRIES = 3  # Attempts per write, including the first
+BUSY_RETRY_DELAY = 0.1  # Seconds before the first retry, doubled after each one
+
+_db_path = DEFAULT_DB_NAME  # Ledger file used by get_connection(), see set_database()
+_pool = {}  # Maps a database path to its PooledConnection
+_pool_lock = threading.Lock()
+_ledger_version = 0  # Bumped by every write made through this module
+_query_tracer = profiling.count_query if profiling.is_enabled() else None  # sqlite3 trace callback
+_commit_delay = 0  # Seconds a commit may be held back to group it with later writes (0 = commit at once)
+
+
+class PooledConnection:
+    """
+    A long-lived SQLite connection shared by the whole app.
+    Entering it with 'with' locks the connection for the current thread and returns it;
+    leaving the outermost 'with' block commits (or rolls back on error).
+    Nested blocks on the same thread join the outer transaction.
+
+    With a commit delay set (see set_commit_delay()), writes are grouped instead:
+    the transaction stays open after the block and a timer commits everything written
+    within the delay at once, saving an fsync per edit. While writes are waiting,
+    each outermost block runs in a savepoint, so an error only undoes that block.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Implicit transactions start with BEGIN IMMEDIATE: the write lock is taken (or waited
+        # for) up front, instead of failing with SQLITE_BUSY when a read turns into a write
+        self.conn = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level="IMMEDIATE", check_same_thread=False
+        )
+        self.conn.row_factory = sqlite3.Row  # Rows can be read by index or converted with dict()
+        for pragma in CONNECTION_PRAGMAS:
+            self.conn.execute(pragma)
+        self.conn.set_trace_callback(_query_tracer)
+        self.lock = threading.RLock()
+        self.depth = 0  # Nesting level of 'with' blocks held by the owning thread
+        self.commit_delay = _commit_delay
+        self.in_savepoint = False  # Outermost block is running in a savepoint
+        self.flush_timer = None
+        self.closed = False  # Set by close(); a timer that fires afterwards does nothing
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.depth += 1
+        if self.depth == 1 and self.conn.in_transaction:
+            self.conn.execute("SAVEPOINT pooled_block")  # Grouped writes from earlier blocks are pending
+            self.in_savepoint = True
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.depth -= 1
+            if self.depth == 0:
+                if self.in_savepoint:
+                    self.in_savepoint = False
+                    if exc_type is not None:
+                        self.conn.execute("ROLLBACK TO pooled_block")
+                    self.conn.execute("RELEASE pooled_block")
+                elif exc_type is not None:
+                    self.conn.rollback()
+                if self.conn.in_transaction:
+                    if self.commit_delay:
+                        self._schedule_flush()
+                    else:
+                        self.conn.commit()
+        finally:
+            self.lock.release()
+        return False
+
+    def _schedule_flush(self):
+        # Commit once the delay has passed since the first write of the group
+        if self.flush_timer is None:
+            self.flush_timer = threading.Timer(self.commit_delay, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self):
+        """Commit grouped writes now. Does nothing while a 'with' block is open or once closed."""
+        with self.lock:
+            if self.closed:
+                return
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if self.depth == 0 and self.conn.in_transaction:
+                self.conn.commit()
+
+    def close(self):
+        # Commit pending writes and close under the lock, so a timer waiting for it finds the
+        # connection marked closed instead of committing on a closed connection
+        with self.lock:
+            self.flush()
+            self.closed = True
+            self.conn.close()
 
-DB_NAME = "money_manager.db"
 
 # Function to get the database connection
-# Returns a new connection to the SQLite database.
-# Use 'with get_connection()' to ensure automatic closing.
-def get_connection():
-    return sqlite3.connect(DB_NAME)
+# Returns the pooled connection for 'path' (by default the current ledger, see
+# set_database()), opening it on first use. Shard files get their own connections.
+# Use 'with get_connection() as conn' to lock it and commit when the block ends.
+def get_connection(path=None):
+    path = path or _db_path
+    with _pool_lock:
+        pooled = _pool.get(path)
+        if pooled is None:
+            pooled = _pool[path] = PooledConnection(path)
+        return pooled
+
+def set_database(path):
+    """
+    Switches the app to another ledger file; later get_connection() calls open it.
+    Connections to the previous file are closed (committing grouped writes) first.
+    """
+    global _db_path
+    close_connection()
+    _db_path = path
+
+def database_path():
+    """Path of the current ledger file."""
+    return _db_path
+
+def close_connection():
+    """
+    Closes every pooled connection, committing any grouped writes first.
+    Called when the app exits so the WAL is checkpointed.
+    A later call to get_connection() opens a fresh connection.
+    """
+    with _pool_lock:
+        for pooled in _pool.values():
+            pooled.close()
+        _pool.clear()
 
-def initialize_db():
+DB_DATE_FORMAT = "%Y-%m-%d"  # ISO-8601, sorts chronologically as text
+LEGACY_DATE_FORMAT = "%B %d, %Y"  # Format used before schema version 1
+SCHEMA_VERSION = 6  # Stored in 'PRAGMA user_version'
+DEFAULT_ACCOUNT = "Main"  # Account of transactions entered without one (and of all rows before version 5)
+MAX_QUERY_PARAMS = 900  # Stay below SQLite's default limit of 999 bound parameters
+
+def set_query_tracer(callback):
+    """
+    Installs a sqlite3 trace callback (called with every SQL statement) on all
+    pooled connections, current and future. Pass None to remove it.
+    """
+    global _query_tracer
+    with _pool_lock:
+        _query_tracer = callback
+        for pooled in _pool.values():
+            with pooled.lock:
+                pooled.conn.set_trace_callback(callback)
+
+def set_commit_delay(seconds):
+    """
+    Groups writes into one commit per 'seconds' on all pooled connections, current and
+    future. Edits made in quick succession then share a commit (and an fsync); the cost
+    is that a crash can lose the writes of the last 'seconds'. Pass 0 to commit every
+    block immediately (the default).
+    """
+    global _commit_delay
+    with _pool_lock:
+        _commit_delay = seconds
+        pools = list(_pool.values())
+    for pooled in pools:
+        pooled.commit_delay = seconds
+        if not seconds:
+            pooled.flush()
+
+def flush_commits():
+    """Commits grouped writes on all pooled connections right away."""
+    with _pool_lock:
+        pools = list(_pool.values())  # Flushed outside _pool_lock; flush() waits for open blocks
+    for pooled in pools:
+        pooled.flush()
+
+@contextmanager
+def savepoint(name="bulk"):
+    """
+    Runs a block of writes atomically: 'with savepoint() as conn:'.
+    The block is a SQLite savepoint inside the current transaction, so on error only
+    its own changes are rolled back, even when it runs inside a larger 'with
+    get_connection()' block or while grouped writes are waiting to be committed.
+    """
+    with get_connection() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")  # Otherwise RELEASE would commit straight away
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        conn.execute(f"RELEASE {name}")
+
+@instrumented
+def fetch_data_version():
+    """
+    Returns SQLite's 'PRAGMA data_version' for the pooled connection.
+    The value changes only when another connection (e.g. another process) commits,
+    so caches can use it to detect changes they did not make themselves.
+    """
+    with get_connection() as conn:
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+@instrumented
+def fetch_ledger_version():
+    """
+    Returns a token that changes whenever the ledger changes.
+    It combines the write counter bumped by this module's insert/update/delete
+    functions with 'PRAGMA data_version' for commits made by other connections.
+    Report caches compare tokens to decide whether their data is stale.
+    """
+    return (_ledger_version, fetch_data_version())
+
+def _bump_ledger_version():
+    global _ledger_version
+    _ledger_version += 1
+
+def _is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error)
+    )
+
+def _retry_when_busy(fn):
+    """
+    Retries a write function when the database stays locked by another process past
+    the busy timeout. Only a call that owns the whole transaction is retried; inside an
+    enclosing 'with get_connection()' block the error is left to the outer caller.
+    Functions with a 'path' argument are checked against that file's connection.
+    """
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        pooled = get_connection(signature.bind_partial(*args, **kwargs).arguments.get('path'))
+        for attempt in range(BUSY_RETRIES):
+            with pooled.lock:
+                nested = pooled.depth > 0
+                try:
+                    return fn(*args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    if nested or not _is_busy(e) or attempt == BUSY_RETRIES - 1:
+                        raise
+            time.sleep(BUSY_RETRY_DELAY * 2 ** attempt)
+    return wrapper
+
+@instrumented
+def initialize_db(path=None):
     """
     Initialize the database and create the table if it doesn't exist.
     This function is called at the start to ensure the database is set up correctly.
+
+    Args:
+        path (str, optional): Ledger file to set up; defaults to the current ledger.
     """
-    create_table()  # This ensures the 'transactions' table is created.
+    create_table(path)  # This ensures the 'transactions' table is created and migrated.
+    if path is None:
+        prune_change_log()
 
-def create_table():
+@instrumented
+@_retry_when_busy
+def create_table(path=None):
     """
-    Creates the transactions table if it doesn't exist already.
-    The table stores transaction details like type, amount, name, category, and date.
+    Creates the ledger tables if they don't exist already and migrates older databases.
+    Transactions store their type, amount, name, category, account and date; category and
+    account names live in the 'categories' and 'accounts' tables and each transaction
+    references one of each by integer ID. Amounts are 64-bit integer cents, so sums are exact.
+    The 'ledger' view joins them back into the familiar transaction columns.
+    Dates are stored as ISO-8601 text ("YYYY-MM-DD") and indexed together with the id,
+    so ordering by date is chronological and date ranges can use the index.
+    The 'shards' table lists the files that older rows have been moved to (see shard_transactions()).
+    'recurring_rules' holds scheduled transactions (rent, salary) and 'budgets' the monthly
+    spending limit of some categories. 'change_log' records every change (see _create_change_log()).
+
+    Args:
+        path (str, optional): Ledger file to set up; defaults to the current ledger.
     """
-    with get_connection() as conn:
+    with get_connection(path) as conn:
         cursor = conn.cursor()
-        cursor.execute(''' 
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                amount REAL NOT NULL,
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS categories (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS accounts (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO accounts (id, name) VALUES (1, ?)", (DEFAULT_ACCOUNT,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shards (
+                path TEXT PRIMARY KEY,
+                account_id INTEGER REFERENCES accounts (id),
+                year TEXT,
+                rows INTEGER NOT NULL,
+                first_date TEXT,
+                last_date TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recurring_rules (
+                id INTEGER PRIMARY KEY,
+                type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+                amount_cents INTEGER NOT NULL CHECK (typeof(amount_cents) = 'integer'),
                 name TEXT NOT NULL,
-                category TEXT,
-                date TEXT NOT NULL
+                category_id INTEGER NOT NULL REFERENCES categories (id),
+                account_id INTEGER NOT NULL DEFAULT 1 REFERENCES accounts (id),
+                frequency TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT,
+                next_date TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS budgets (
+                category_id INTEGER PRIMARY KEY REFERENCES categories (id),
+                limit_cents INTEGER NOT NULL
             )
         ''')
-        conn.commit()
+        _create_transactions_table(conn, 'transactions')
+        migrate_schema(conn)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_date_id
+            ON transactions (date, id)
+        ''')
+        # Composite indexes for the structured search filters; each keeps the log order
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_type_date_id
+            ON transactions (type, date, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_category_date_id
+            ON transactions (category_id, date, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_amount
+            ON transactions (amount_cents)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_account_date_id
+            ON transactions (account_id, date, id)
+        ''')
+
+def migrate_schema(conn):
+    """
+    Brings an existing database up to SCHEMA_VERSION.
+    The version is tracked with 'PRAGMA user_version'; each step runs only once.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the database.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        _migrate_dates_to_iso(conn)
+    if version < 4:
+        # Version 3 added the categories table, version 4 integer cents. Both changed
+        # columns, so older databases are copied into the current layout once.
+        _rebuild_transactions(conn)
+    if version < 5:
+        # Version 2 added the search index, version 3 the rollup and version 5 accounts.
+        # They all sit on the table layout, so they are (re)built on top of it here.
+        _add_account_column(conn)
+        _create_ledger_view(conn)
+        _create_search_index(conn)
+        _create_category_rollup(conn)
+    if version < 6:
+        _create_change_log(conn)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _migrate_dates_to_iso(conn):
+    """
+    Schema version 1: rewrites "Month Day, Year" dates as ISO-8601 in one batched pass.
+    Rows that already hold an ISO date are left untouched.
+    """
+    cursor = conn.execute(
+        "SELECT id, date FROM transactions WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    )
+    updates = []
+    for trans_id, date_str in cursor.fetchall():
+        try:
+            iso_date = datetime.strptime(date_str, LEGACY_DATE_FORMAT).strftime(DB_DATE_FORMAT)
+        except (TypeError, ValueError) as e:
+            print(f"Skipping invalid date: {date_str} - {e}")
+            continue
+        updates.append((iso_date, trans_id))
+    conn.executemany("UPDATE transactions SET date = ? WHERE id = ?", updates)
+
+def _create_transactions_table(conn, table):
+    # Current layout of the transactions table; 'table' lets migrations build a copy
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL CHECK (typeof(amount_cents) = 'integer'),
+            name TEXT NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            date TEXT NOT NULL,
+            account_id INTEGER NOT NULL DEFAULT 1 REFERENCES accounts (id)
+        )
+    ''')
+
+def _add_account_column(conn):
+    # Schema version 5: every existing transaction belongs to the default account (ID 1)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if 'account_id' not in columns:
+        conn.execute("ALTER TABLE transactions ADD COLUMN account_id INTEGER NOT NULL DEFAULT 1 REFERENCES accounts (id)")
+
+def _rebuild_transactions(conn):
+    """
+    Copies a transactions table from an older layout into the current one:
+    free-text categories become references into 'categories' (version 3) and REAL
+    dollar amounts become integer cents (version 4). SQLite can't change columns in
+    place, so the rows are copied (keeping every ID) into a new table that is swapped in.
+    The view, search index and rollup built on the old table are dropped and recreated
+    by the caller. New databases are created in the current layout and skip the copy.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if 'category_id' in columns and 'amount_cents' in columns:
+        return
+    conn.execute("DROP VIEW IF EXISTS ledger")
+    conn.execute("DROP TABLE IF EXISTS transactions_fts")
+    conn.execute("DROP TABLE IF EXISTS category_month_totals")
+
+    if 'category_id' in columns:
+        category_sql, join_sql = "t.category_id", ""
+    else:
+        conn.execute(
+            "INSERT OR IGNORE INTO categories (name) SELECT DISTINCT COALESCE(category, '') FROM transactions"
+        )
+        category_sql, join_sql = "c.id", "JOIN categories c ON c.name = COALESCE(t.category, '')"
+    _create_transactions_table(conn, 'transactions_new')
+    conn.execute(f'''
+        INSERT INTO transactions_new (id, type, amount_cents, name, category_id, date)
+        SELECT t.id, t.type, CAST(ROUND(t.amount * 100) AS INTEGER), t.name, {category_sql}, t.date
+        FROM transactions t {join_sql}
+    ''')
+    conn.execute("DROP TABLE transactions")
+    conn.execute("ALTER TABLE transactions_new RENAME TO transactions")
+
+def _create_ledger_view(conn):
+    # 'ledger' joins the category and account names back in, giving the transaction columns the app reads
+    conn.execute("DROP VIEW IF EXISTS ledger")
+    conn.execute('''
+        CREATE VIEW ledger AS
+        SELECT t.id, t.type, t.amount_cents, t.name, c.name AS category, t.date, a.name AS account
+        FROM transactions t
+        JOIN categories c ON c.id = t.category_id
+        JOIN accounts a ON a.id = t.account_id
+    ''')
+
+def _create_search_index(conn):
+    """
+    Full-text index over name and category.
+    'transactions_fts' is an FTS5 table that reads its content from the 'ledger' view
+    and is kept in sync by triggers on 'transactions'. It is filled in one 'rebuild' pass.
+    If this SQLite build lacks FTS5, text search falls back to LIKE.
+    An index that already exists is kept as it is.
+    """
+    if _has_search_index(conn):
+        return
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                name, category, content='ledger', content_rowid='id', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable, using LIKE instead: {e}")
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, name, category)
+            VALUES (new.id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, name, category)
+            VALUES ('delete', old.id, old.name, (SELECT name FROM categories WHERE id = old.category_id));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF name, category_id ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, name, category)
+            VALUES ('delete', old.id, old.name, (SELECT name FROM categories WHERE id = old.category_id));
+            INSERT INTO transactions_fts (rowid, name, category)
+            VALUES (new.id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+        END
+    ''')
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+def _create_category_rollup(conn):
+    """
+    'category_month_totals' holds the sum (in cents) and count of amounts
+    per (account, type, category, month), maintained by triggers on every insert,
+    update and delete. Balance and expense summaries read these few pre-summed rows
+    instead of aggregating the ledger. Rows whose count drops to zero are removed.
+    An existing rollup (and its triggers) is dropped and rebuilt from the ledger.
+    """
+    conn.execute("DROP TABLE IF EXISTS category_month_totals")
+    for trigger in ('rollup_insert', 'rollup_delete', 'rollup_update'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute('''
+        CREATE TABLE category_month_totals (
+            account_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            total_cents INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (account_id, type, category_id, month)
+        ) WITHOUT ROWID
+    ''')
+    add_new = '''
+        INSERT INTO category_month_totals (account_id, type, category_id, month, total_cents, count)
+        VALUES (new.account_id, new.type, new.category_id, substr(new.date, 1, 7), new.amount_cents, 1)
+        ON CONFLICT (account_id, type, category_id, month)
+        DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    '''
+    old_key = '''
+        account_id = old.account_id AND type = old.type AND category_id = old.category_id
+        AND month = substr(old.date, 1, 7)
+    '''
+    remove_old = f'''
+        UPDATE category_month_totals SET total_cents = total_cents - old.amount_cents, count = count - 1
+        WHERE {old_key};
+        DELETE FROM category_month_totals WHERE {old_key} AND count = 0;
+    '''
+    conn.execute(f"CREATE TRIGGER rollup_insert AFTER INSERT ON transactions BEGIN {add_new} END")
+    conn.execute(f"CREATE TRIGGER rollup_delete AFTER DELETE ON transactions BEGIN {remove_old} END")
+    conn.execute(f'''
+        CREATE TRIGGER rollup_update
+        AFTER UPDATE OF type, amount_cents, category_id, date, account_id ON transactions
+        BEGIN {remove_old} {add_new} END
+    ''')
+    conn.execute('''
+        INSERT INTO category_month_totals (account_id, type, category_id, month, total_cents, count)
+        SELECT account_id, type, category_id, substr(date, 1, 7), SUM(amount_cents), COUNT(*)
+        FROM transactions
+        GROUP BY account_id, type, category_id, substr(date, 1, 7)
+    ''')
+
+CHANGE_LOG_KEEP = 100000  # Change log entries kept when it is pruned
+
+def _create_change_log(conn):
+    """
+    Creates 'change_log', an append-only feed of every change to the ledger, so each
+    process can catch up with what others wrote instead of reloading everything.
+    Triggers add one entry per changed row with a strictly increasing 'seq'
+    (AUTOINCREMENT never reuses numbers). Updates and deletes of transactions keep the
+    row's old values, so readers can take it out of their aggregates. 'kind' is
+    'transaction', 'rule', 'budget', 'account', or 'reload' for bulk changes after
+    which readers should reload (see shard_transactions()).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER,
+            old_type TEXT,
+            old_amount_cents INTEGER,
+            old_category_id INTEGER,
+            old_account_id INTEGER,
+            old_date TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS change_log_transaction_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO change_log (kind, op, row_id) VALUES ('transaction', 'insert', new.id);
+        END
+    ''')
+    for op in ('update', 'delete'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS change_log_transaction_{op} AFTER {op.upper()} ON transactions BEGIN
+                INSERT INTO change_log
+                    (kind, op, row_id, old_type, old_amount_cents, old_category_id, old_account_id, old_date)
+                VALUES
+                    ('transaction', '{op}', old.id, old.type, old.amount_cents, old.category_id, old.account_id, old.date);
+            END
+        ''')
+    for kind, table, key in (('rule', 'recurring_rules', 'id'), ('budget', 'budgets', 'category_id')):
+        for op, row in (('insert', 'new'), ('update', 'new'), ('delete', 'old')):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS change_log_{kind}_{op} AFTER {op.upper()} ON {table} BEGIN
+                    INSERT INTO change_log (kind, op, row_id) VALUES ('{kind}', '{op}', {row}.{key});
+                END
+            ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS change_log_account_insert AFTER INSERT ON accounts BEGIN
+            INSERT INTO change_log (kind, op, row_id) VALUES ('account', 'insert', new.id);
+        END
+    ''')
+
+@instrumented
+def fetch_change_seq():
+    """
+    Returns:
+        int: The sequence number of the latest change_log entry (0 if there is none).
+    """
+    with get_connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+@instrumented
+def fetch_changes(after_seq, limit):
+    """
+    Reads the change_log entries that follow a sequence number, oldest first, together
+    with the current version of every transaction they mention. Both are read in one
+    snapshot, so rows committed later by other processes can't slip in ahead of their
+    own change_log entries.
+
+    Args:
+        after_seq (int): The last sequence number the caller has already applied.
+        limit (int): Most entries to return.
+
+    Returns:
+        tuple: (changes, rows, last_seq). 'changes' are dicts with 'seq', 'kind', 'op',
+        'row_id' and 'old' (for transaction updates and deletes, the row before the change
+        with 'id', 'type', 'amount_cents', 'category', 'account' and 'date'; otherwise None).
+        'rows' maps the ID of each changed transaction that still exists to its current
+        row. 'last_seq' is the latest sequence number in the snapshot.
+    """
+    with get_connection() as conn:
+        began = not conn.in_transaction
+        if began:
+            conn.execute("BEGIN")  # Deferred: a read transaction, so one snapshot
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT l.seq, l.kind, l.op, l.row_id, l.old_type, l.old_amount_cents, c.name, a.name, l.old_date
+                FROM change_log l
+                LEFT JOIN categories c ON c.id = l.old_category_id
+                LEFT JOIN accounts a ON a.id = l.old_account_id
+                WHERE l.seq > ?
+                ORDER BY l.seq
+                LIMIT ?
+            ''', (after_seq, limit))
+            changes = []
+            for seq, kind, op, row_id, old_type, old_cents, category, account, old_date in cursor.fetchall():
+                old = None
+                if old_type is not None:
+                    old = {
+                        'id': row_id, 'type': old_type, 'amount_cents': old_cents,
+                        'category': category, 'account': account, 'date': old_date,
+                    }
+                changes.append({'seq': seq, 'kind': kind, 'op': op, 'row_id': row_id, 'old': old})
+            rows = fetch_transactions_by_ids(
+                {change['row_id'] for change in changes if change['kind'] == 'transaction'}
+            )
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        finally:
+            if began:
+                conn.commit()  # End the snapshot now, even while grouped writes would wait
+        return changes, rows, last_seq
+
+@instrumented
+@_retry_when_busy
+def prune_change_log(keep=CHANGE_LOG_KEEP):
+    """
+    Drops all but the latest 'keep' change_log entries, so the feed doesn't grow forever.
+
+    Returns:
+        int: The number of entries dropped.
+    """
+    with get_connection() as conn:
+        cursor = conn.execute(
+            "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,)
+        )
+        return cursor.rowcount
+
+def _has_search_index(conn):
+    # Whether the FTS5 table exists (it won't on SQLite builds without FTS5)
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+    ).fetchone() is not None
+
+def _fts_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Words are quoted so punctuation in user input can't break the query syntax.
+    """
+    words = text.split()
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+def _filter_clause(conn, filters):
+    """
+    Builds the WHERE clause for the search filters.
 
-def insert_transaction(trans_type, amount, name, category):
+    Args:
+        conn (sqlite3.Connection): The connection the query will run on.
+        filters (dict, optional): Any of 'text' (matched against name and category),
+            'type', 'category', 'account', 'min_cents', 'max_cents' (amounts in cents),
+            'date_from', 'date_to' (ISO dates, inclusive). Empty values are ignored.
+
+    Returns:
+        tuple: (sql, params) where sql is '' or starts with 'WHERE'.
+    """
+    if not filters:
+        return "", []
+    clauses, params = [], []
+    text = (filters.get('text') or '').strip()
+    if text:
+        if _has_search_index(conn):
+            clauses.append("id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+            params.append(_fts_query(text))
+        else:
+            clauses.append("(name LIKE ? OR category LIKE ?)")
+            params.extend([f"%{text}%"] * 2)
+    for key, clause in (
+        ('type', "type = ?"),
+        ('category', "category = ?"),
+        ('account', "account = ?"),
+        ('min_cents', "amount_cents >= ?"),
+        ('max_cents', "amount_cents <= ?"),
+        ('date_from', "date >= ?"),
+        ('date_to', "date <= ?"),
+    ):
+        value = filters.get(key)
+        if value is not None and value != '':
+            clauses.append(clause)
+            params.append(value)
+    if not clauses:
+        return "", []
+    return "WHERE " + " AND ".join(clauses), params
+
+def _intern_names(conn, table, names):
+    """
+    Interns names in a lookup table ('categories' or 'accounts'): adds any that are new.
+
+    Args:
+        conn (sqlite3.Connection): The connection of the current transaction.
+        table (str): The table holding the names.
+        names (iterable): Category or account names.
+
+    Returns:
+        dict: Maps each name to its ID.
+    """
+    names = list(set(names))
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(n,) for n in names])
+    ids = {}
+    for start in range(0, len(names), MAX_QUERY_PARAMS):
+        batch = names[start:start + MAX_QUERY_PARAMS]
+        placeholders = ", ".join("?" * len(batch))
+        ids.update(conn.execute(f"SELECT name, id FROM {table} WHERE name IN ({placeholders})", batch).fetchall())
+    return ids
+
+@instrumented
+@_retry_when_busy
+def insert_transaction(trans_type, amount_cents, name, category, account=DEFAULT_ACCOUNT):
     """
     Inserts a new income or expense transaction into the database.
-    The date is stored in "Month Day, Year" format 
+    The date is stored in ISO-8601 "YYYY-MM-DD" format.
     Args:
         trans_type (str): The type of transaction, either 'income' or 'expense'.
-        amount (float): The amount of the transaction.
+        amount_cents (int): The amount of the transaction in cents.
         name (str): The name of the transaction.
         category (str): The category of the transaction.
+        account (str, optional): The account of the transaction; created if it is new.
+
+    Returns:
+        dict: The inserted transaction, including its new 'id' and 'date'.
     """
+    date = datetime.now().strftime(DB_DATE_FORMAT)
     with get_connection() as conn:
         cursor = conn.cursor()
+        category_id = _intern_names(conn, 'categories', [category])[category]
+        account_id = _intern_names(conn, 'accounts', [account])[account]
         cursor.execute(''' 
-            INSERT INTO transactions (type, amount, name, category, date)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (trans_type, amount, name, category, datetime.now().strftime("%B %d, %Y")))
-        conn.commit()
+            INSERT INTO transactions (type, amount_cents, name, category_id, date, account_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (trans_type, amount_cents, name, category_id, date, account_id))
+        _bump_ledger_version()
+        return {
+            'id': cursor.lastrowid, 'type': trans_type, 'amount_cents': amount_cents,
+            'name': name, 'category': category, 'date': date, 'account': account
+        }
+
+@instrumented
+@_retry_when_busy
+def insert_transactions(rows, account=DEFAULT_ACCOUNT):
+    """
+    Inserts many transactions with a single executemany call.
+    Wrap several calls in 'with get_connection():' to commit them as one transaction.
+
+    Args:
+        rows (iterable): Tuples of (type, amount_cents, name, category, date), with the
+            amount in integer cents and the date already in ISO "YYYY-MM-DD" format.
+        account (str, optional): The account all the rows belong to.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    rows = list(rows)
+    with get_connection() as conn:
+        category_ids = _intern_names(conn, 'categories', (row[3] for row in rows))
+        account_id = _intern_names(conn, 'accounts', [account])[account]
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO transactions (type, amount_cents, name, category_id, date, account_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ((t, cents, name, category_ids[category], date, account_id) for t, cents, name, category, date in rows))
+        _bump_ledger_version()
+        return cursor.rowcount
+
+@instrumented
+@_retry_when_busy
+def restore_transactions(rows):
+    """
+    Re-inserts transactions exactly as they were, keeping their IDs and dates,
+    e.g. to undo a delete. IDs are never reused (AUTOINCREMENT), so they are free.
 
+    Args:
+        rows (iterable): Transaction dictionaries as returned by the fetch functions.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    rows = list(rows)
+    with get_connection() as conn:
+        category_ids = _intern_names(conn, 'categories', (row['category'] for row in rows))
+        account_ids = _intern_names(conn, 'accounts', (row.get('account', DEFAULT_ACCOUNT) for row in rows))
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO transactions (id, type, amount_cents, name, category_id, date, account_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ((row['id'], row['type'], row['amount_cents'], row['name'], category_ids[row['category']], row['date'],
+               account_ids[row.get('account', DEFAULT_ACCOUNT)])
+              for row in rows))
+        _bump_ledger_version()
+        return cursor.rowcount
+
+@instrumented
 def fetch_transactions():
     """
     Fetches all transactions from the database, ordered by the transaction date in descending order.
     
     Returns:
-        List of dictionaries: Each dictionary represents a transaction with keys 'id', 'type', 'amount', 'name', 'category', 'date'.
+        List of dictionaries: Each dictionary represents a transaction with keys 'id', 'type', 'amount_cents', 'name', 'category', 'date', 'account'.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM ledger ORDER BY date DESC, id DESC')
+        return [dict(row) for row in cursor.fetchall()]
+
+@instrumented
+def fetch_transaction_by_id(trans_id):
+    """
+    Fetches a single transaction by its primary key.
+
+    Args:
+        trans_id (int): The ID of the transaction.
+
+    Returns:
+        dict or None: The transaction, or None if no row has that ID.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM ledger WHERE id = ?', (trans_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+@instrumented
+def fetch_transactions_by_ids(trans_ids):
+    """
+    Fetches several transactions by primary key, e.g. for multi-select operations.
+    IDs are looked up in batches so the query stays within SQLite's parameter limit.
+
+    Args:
+        trans_ids (iterable): The IDs of the transactions.
+
+    Returns:
+        dict: Maps each ID that exists to its transaction dictionary.
+    """
+    trans_ids = list(trans_ids)
+    found = {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(trans_ids), MAX_QUERY_PARAMS):
+            batch = trans_ids[start:start + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(f'SELECT * FROM ledger WHERE id IN ({placeholders})', batch)
+            for row in cursor.fetchall():
+                found[row['id']] = dict(row)
+    return found
+
+@instrumented
+def fetch_transactions_page(limit, offset=0, after=None, filters=None):
+    """
+    Fetches one page of transactions, newest first, for the virtualized transaction log.
+    When a keyset cursor is given the page starts right after that row, which uses the
+    (date, id) index directly; otherwise the page is selected with OFFSET.
+
+    Args:
+        limit (int): The maximum number of rows to return.
+        offset (int, optional): The number of rows to skip when no cursor is given.
+        after (tuple, optional): A (date, id) cursor; only older rows are returned.
+        filters (dict, optional): Search filters, see _filter_clause().
+
+    Returns:
+        List of dictionaries: The transactions on the page, in display order.
     """
     with get_connection() as conn:
-        conn.row_factory = sqlite3.Row  # Ensures results are returned as dictionaries
+        where, params = _filter_clause(conn, filters)
+        if after is not None:
+            where = f"{where} AND (date, id) < (?, ?)" if where else "WHERE (date, id) < (?, ?)"
+            params = params + [after[0], after[1]]
+            offset = 0
+        # Page through the IDs first so skipped rows never go through the category join;
+        # without filters the (date, id) index alone covers the inner query
+        source = 'ledger' if where else 'transactions'
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM transactions ORDER BY date DESC')
+        cursor.execute(f'''
+            SELECT * FROM ledger WHERE id IN (
+                SELECT id FROM {source} {where} ORDER BY date DESC, id DESC LIMIT ? OFFSET ?
+            )
+            ORDER BY date DESC, id DESC
+        ''', params + [limit, offset])
         return [dict(row) for row in cursor.fetchall()]
 
-def update_transaction_by_id(trans_id, new_name=None, new_amount=None, new_category=None):
+@instrumented
+def count_transactions(filters=None):
+    """
+    Counts the transactions in the database, optionally only those matching the search filters.
+
+    Args:
+        filters (dict, optional): Search filters, see _filter_clause().
+
+    Returns:
+        int: The number of matching rows.
+    """
+    with get_connection() as conn:
+        where, params = _filter_clause(conn, filters)
+        cursor = conn.cursor()
+        # The view's join is only needed when a filter looks at the category name
+        source = 'ledger' if where else 'transactions'
+        cursor.execute(f'SELECT COUNT(*) FROM {source} {where}', params)
+        return cursor.fetchone()[0]
+
+def iter_transaction_batches(batch_size, filters=None):
+    """
+    Streams transactions oldest first, in batches, for exports and backups.
+    A single cursor walks the (date, id) index, so memory stays bounded by one batch
+    and the whole export reads one consistent snapshot of the ledger.
+    The pooled connection stays locked until the generator is exhausted or closed.
+
+    Args:
+        batch_size (int): The maximum number of rows per batch.
+        filters (dict, optional): Search filters, see _filter_clause().
+
+    Yields:
+        list: Plain tuples of (id, date, type, name, category, amount_cents, account).
+    """
+    with get_connection() as conn:
+        where, params = _filter_clause(conn, filters)
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Plain tuples, no per-row sqlite3.Row objects
+        cursor.execute(f'''
+            SELECT id, date, type, name, category, amount_cents, account FROM ledger {where}
+            ORDER BY date, id
+        ''', params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield batch
+
+@instrumented
+@_retry_when_busy
+def update_transaction_by_id(trans_id, new_name=None, new_amount_cents=None, new_category=None):
     """
     Updates a transaction by ID. Only updates fields provided (name, amount, category).
     
     Args:
         trans_id (int): The ID of the transaction to update.
         new_name (str, optional): The new name of the transaction.
-        new_amount (float, optional): The new amount of the transaction.
+        new_amount_cents (int, optional): The new amount of the transaction in cents.
         new_category (str, optional): The new category of the transaction.
     
     Returns:
@@ -87,12 +1017,12 @@ def update_transaction_by_id(trans_id, new_name=None, new_amount=None, new_categ
         if new_name:
             update_fields.append("name = ?")
             values.append(new_name)
-        if new_amount:
-            update_fields.append("amount = ?")
-            values.append(float(new_amount))
+        if new_amount_cents:
+            update_fields.append("amount_cents = ?")
+            values.append(int(new_amount_cents))
         if new_category:
-            update_fields.append("category = ?")
-            values.append(new_category)
+            update_fields.append("category_id = ?")
+            values.append(_intern_names(conn, 'categories', [new_category])[new_category])
 
         if not update_fields:
             return False  # No updates to perform
@@ -100,9 +1030,11 @@ def update_transaction_by_id(trans_id, new_name=None, new_amount=None, new_categ
         values.append(trans_id)  # Add trans_id to values for WHERE clause
         sql = f"UPDATE transactions SET {', '.join(update_fields)} WHERE id = ?"
         cursor.execute(sql, values)
-        conn.commit()
+        _bump_ledger_version()
         return cursor.rowcount > 0  # Return True if rows were updated
 
+@instrumented
+@_retry_when_busy
 def delete_transaction_by_id(trans_id):
     """
     Deletes a transaction by its ID.
@@ -116,18 +1048,468 @@ def delete_transaction_by_id(trans_id):
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM transactions WHERE id = ?", (trans_id,))
-        conn.commit()
+        _bump_ledger_version()
         return cursor.rowcount > 0  # Return True if a row was deleted
 
+@instrumented
+@_retry_when_busy
+def delete_transactions_by_ids(trans_ids):
+    """
+    Deletes several transactions by ID, in batches within SQLite's parameter limit.
+    Wrap the call in 'with savepoint():' to make a bulk delete all-or-nothing.
+
+    Args:
+        trans_ids (iterable): The IDs of the transactions to delete.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    trans_ids = list(trans_ids)
+    deleted = 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(trans_ids), MAX_QUERY_PARAMS):
+            batch = trans_ids[start:start + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(f"DELETE FROM transactions WHERE id IN ({placeholders})", batch)
+            deleted += cursor.rowcount
+        _bump_ledger_version()
+    return deleted
+
+@instrumented
+def fetch_transaction_ids_by_category(category):
+    """
+    Fetches the IDs of all transactions in a category.
+
+    Args:
+        category (str): The category name.
+
+    Returns:
+        list: Transaction IDs.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT t.id FROM transactions t JOIN categories c ON c.id = t.category_id
+            WHERE c.name = ?
+        ''', (category,))
+        return [row[0] for row in cursor.fetchall()]
+
+@instrumented
+@_retry_when_busy
+def update_category_by_ids(trans_ids, category):
+    """
+    Moves several transactions to another category, in batches within SQLite's parameter limit.
+
+    Args:
+        trans_ids (iterable): The IDs of the transactions.
+        category (str): The new category name; created if it is new.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    trans_ids = list(trans_ids)
+    updated = 0
+    with get_connection() as conn:
+        category_id = _intern_names(conn, 'categories', [category])[category]
+        cursor = conn.cursor()
+        for start in range(0, len(trans_ids), MAX_QUERY_PARAMS):
+            batch = trans_ids[start:start + MAX_QUERY_PARAMS]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(
+                f"UPDATE transactions SET category_id = ? WHERE id IN ({placeholders})", [category_id] + batch
+            )
+            updated += cursor.rowcount
+        _bump_ledger_version()
+    return updated
+
+@instrumented
 def get_transactions():
     """
     Fetches all transactions from the database, ordered by the transaction date in descending order.
     
     Returns:
-        List of dictionaries: Each dictionary represents a transaction with keys 'id', 'type', 'amount', 'name', 'category', 'date'.
+        List of dictionaries: Each dictionary represents a transaction with keys 'id', 'type', 'amount_cents', 'name', 'category', 'date', 'account'.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM ledger ORDER BY date DESC, id DESC')
+        return [dict(row) for row in cursor.fetchall()]
+
+@instrumented
+def fetch_balance(account=None, path=None):
+    """
+    Calculates the current balance from the per-category, per-month rollup,
+    so only a few pre-summed rows are read however long the ledger is.
+
+    Args:
+        account (str, optional): Only this account's balance; all accounts by default.
+        path (str, optional): Ledger or shard file to read; defaults to the current ledger.
+
+    Returns:
+        int: The total income minus the total expenses, in cents.
+    """
+    with get_connection(path) as conn:
+        cursor = conn.cursor()
+        where, params = "", []
+        if account is not None:
+            where, params = "WHERE account_id = (SELECT id FROM accounts WHERE name = ?)", [account]
+        cursor.execute(f'''
+            SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN total_cents ELSE -total_cents END), 0)
+            FROM category_month_totals {where}
+        ''', params)
+        return cursor.fetchone()[0]
+
+@instrumented
+def fetch_account_balances(path=None):
+    """
+    Balance of every account from the rollup.
+
+    Args:
+        path (str, optional): Ledger or shard file to read; defaults to the current ledger.
+
+    Returns:
+        dict: Maps each account name to its balance in cents (0 for accounts without rows).
+    """
+    with get_connection(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.name, COALESCE(SUM(CASE WHEN r.type = 'income' THEN r.total_cents ELSE -r.total_cents END), 0)
+            FROM accounts a LEFT JOIN category_month_totals r ON r.account_id = a.id
+            GROUP BY a.id
+            ORDER BY a.name
+        ''')
+        return dict(cursor.fetchall())
+
+@instrumented
+def fetch_expense_by_category(path=None, month=None):
+    """
+    Sums the expenses per category from the 'category_month_totals' rollup.
+
+    Args:
+        path (str, optional): Ledger or shard file to read; defaults to the current ledger.
+        month (str, optional): Only this 'YYYY-MM' month, e.g. to check budgets.
+
+    Returns:
+        dict: Maps each category name to its total expense amount in cents.
+    """
+    with get_connection(path) as conn:
+        cursor = conn.cursor()
+        where, params = "", []
+        if month is not None:
+            where, params = "AND r.month = ?", [month]
+        cursor.execute(f'''
+            SELECT c.name, SUM(r.total_cents)
+            FROM category_month_totals r JOIN categories c ON c.id = r.category_id
+            WHERE r.type = 'expense' {where}
+            GROUP BY r.category_id
+        ''', params)
+        return dict(cursor.fetchall())
+
+@instrumented
+def fetch_monthly_expenses(path=None):
+    """
+    Sums the expenses per month from the 'category_month_totals' rollup.
+
+    Args:
+        path (str, optional): Ledger or shard file to read; defaults to the current ledger.
+
+    Returns:
+        dict: Maps a 'MM-YYYY' key to the total expense amount for that month in cents,
+        in chronological order.
+    """
+    with get_connection(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT month, SUM(total_cents)
+            FROM category_month_totals
+            WHERE type = 'expense'
+            GROUP BY month
+            ORDER BY month
+        ''')
+        return {f"{month[5:7]}-{month[:4]}": total for month, total in cursor.fetchall()}
+
+@instrumented
+def fetch_categories():
+    """
+    Fetches every category name, for autocomplete.
+
+    Returns:
+        list: Category names in alphabetical order.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name FROM categories ORDER BY name')
+        return [row[0] for row in cursor.fetchall()]
+
+@instrumented
+def fetch_accounts():
+    """
+    Fetches every account name.
+
+    Returns:
+        list: Account names in alphabetical order.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name FROM accounts ORDER BY name')
+        return [row[0] for row in cursor.fetchall()]
+
+@instrumented
+@_retry_when_busy
+def insert_account(name):
+    """
+    Adds an account, if it doesn't exist yet.
+
+    Args:
+        name (str): The account name.
+
+    Returns:
+        bool: True if the account was added, False if it already existed.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO accounts (name) VALUES (?)", (name,))
+        added = cursor.rowcount > 0
+        if added:
+            _bump_ledger_version()
+        return added
+
+_RULE_COLUMNS = '''
+    r.id, r.type, r.amount_cents, r.name, c.name AS category, a.name AS account,
+    r.frequency, r.start_date, r.end_date, r.next_date
+    FROM recurring_rules r
+    JOIN categories c ON c.id = r.category_id
+    JOIN accounts a ON a.id = r.account_id
+'''
+
+@instrumented
+@_retry_when_busy
+def insert_recurring_rule(trans_type, amount_cents, name, category, frequency, start_date,
+                          end_date=None, account=DEFAULT_ACCOUNT):
+    """
+    Adds a recurring transaction, e.g. monthly rent or a biweekly salary.
+    Its first occurrence is due on the start date (see post_recurring_rule()).
+
+    Args:
+        trans_type (str): 'income' or 'expense'.
+        amount_cents (int): The amount of every occurrence, in cents.
+        name (str): The name given to the posted transactions.
+        category (str): Their category.
+        frequency (str): 'weekly', 'biweekly', 'monthly', 'quarterly' or 'yearly'.
+        start_date (str): ISO date of the first occurrence; later ones keep its day of the month.
+        end_date (str, optional): ISO date after which the rule stops.
+        account (str, optional): The account the transactions are posted to.
+
+    Returns:
+        dict: The new rule, as returned by fetch_recurring_rules().
     """
     with get_connection() as conn:
-        conn.row_factory = sqlite3.Row  # Ensures results are returned as dictionaries
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM transactions ORDER BY date DESC')
-        return [dict(row) for row in cursor.fetchall()]
\ No newline at end of file
+        category_id = _intern_names(conn, 'categories', [category])[category]
+        account_id = _intern_names(conn, 'accounts', [account])[account]
+        cursor.execute('''
+            INSERT INTO recurring_rules
+                (type, amount_cents, name, category_id, account_id, frequency, start_date, end_date, next_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (trans_type, amount_cents, name, category_id, account_id, frequency, start_date, end_date, start_date))
+        return {
+            'id': cursor.lastrowid, 'type': trans_type, 'amount_cents': amount_cents, 'name': name,
+            'category': category, 'account': account, 'frequency': frequency,
+            'start_date': start_date, 'end_date': end_date, 'next_date': start_date,
+        }
+
+@instrumented
+def fetch_recurring_rules():
+    """
+    Fetches every recurring rule.
+
+    Returns:
+        list: Rule dicts with 'id', 'type', 'amount_cents', 'name', 'category', 'account',
+        'frequency', 'start_date', 'end_date' and 'next_date' (first occurrence not posted yet).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_RULE_COLUMNS} ORDER BY r.next_date, r.id")
+        return [dict(row) for row in cursor.fetchall()]
+
+@instrumented
+@_retry_when_busy
+def delete_recurring_rule(rule_id):
+    """
+    Deletes a recurring rule; transactions it already posted are kept.
+
+    Returns:
+        bool: True if the rule existed.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM recurring_rules WHERE id = ?", (rule_id,))
+        return cursor.rowcount > 0
+
+@instrumented
+@_retry_when_busy
+def post_recurring_rule(rule, dates, next_date):
+    """
+    Posts the due occurrences of a rule as transactions and moves its 'next_date' on,
+    in one transaction so an occurrence is never posted twice.
+
+    Args:
+        rule (dict): The rule, as returned by fetch_recurring_rules().
+        dates (list): ISO dates of the occurrences to post.
+        next_date (str): ISO date of the first occurrence left to post.
+
+    Returns:
+        int: The number of transactions posted.
+    """
+    with savepoint("post_rule") as conn:
+        rows = [(rule['type'], rule['amount_cents'], rule['name'], rule['category'], date) for date in dates]
+        posted = insert_transactions(rows, rule['account']) if rows else 0
+        conn.execute("UPDATE recurring_rules SET next_date = ? WHERE id = ?", (next_date, rule['id']))
+        return posted
+
+@instrumented
+@_retry_when_busy
+def set_budget(category, limit_cents):
+    """
+    Sets the monthly spending limit of a category; a limit of None removes it.
+    """
+    with get_connection() as conn:
+        if limit_cents is None:
+            conn.execute(
+                "DELETE FROM budgets WHERE category_id = (SELECT id FROM categories WHERE name = ?)", (category,)
+            )
+            return
+        category_id = _intern_names(conn, 'categories', [category])[category]
+        conn.execute('''
+            INSERT INTO budgets (category_id, limit_cents) VALUES (?, ?)
+            ON CONFLICT (category_id) DO UPDATE SET limit_cents = excluded.limit_cents
+        ''', (category_id, limit_cents))
+
+@instrumented
+def fetch_budgets():
+    """
+    Returns:
+        dict: Maps each budgeted category name to its monthly limit in cents.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT c.name, b.limit_cents
+            FROM budgets b JOIN categories c ON c.id = b.category_id
+            ORDER BY c.name
+        ''')
+        return dict(cursor.fetchall())
+
+def _shard_file(account_id, year):
+    # 'money_manager.db' -> 'money_manager.2019.db', 'money_manager.account-2.db', ...
+    root, extension = os.path.splitext(_db_path)
+    parts = ([f"account-{account_id}"] if account_id is not None else []) + ([year] if year else [])
+    return f"{root}.{'.'.join(parts)}{extension or '.db'}"
+
+@instrumented
+@_retry_when_busy
+def shard_transactions(year=None, account=None):
+    """
+    Moves the transactions of one year and/or one account out of the live ledger into
+    a shard file of their own (e.g. 'money_manager.2019.db'), so queries on current data
+    no longer wade through them. The shard is a complete ledger database with its own
+    rollup; it is attached with ATTACH and the rows are copied with their IDs in one
+    transaction, so moving the same year again later merges into the same file. Categories and accounts are
+    copied with their IDs too, so codes mean the same thing in every shard.
+    The shard is listed in the 'shards' table with its row count and date range, and
+    a 'reload' entry in the change_log tells other processes to reload their caches.
+
+    Args:
+        year (str or int, optional): Calendar year to move, e.g. 2019.
+        account (str, optional): Account to move.
+
+    Returns:
+        dict: The shard's 'path', 'rows' moved, 'first_date' and 'last_date'.
+
+    Raises:
+        ValueError: If neither a year nor an existing account is given.
+    """
+    if year is None and account is None:
+        raise ValueError("Shard by year, by account or both.")
+    year = str(year) if year is not None else None
+    flush_commits()  # ATTACH can't run inside a transaction
+    with get_connection() as conn:
+        account_id = None
+        if account is not None:
+            row = conn.execute("SELECT id FROM accounts WHERE name = ?", (account,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown account: {account}")
+            account_id = row[0]
+        path = _shard_file(account_id, year)
+        where, params = [], []
+        if account_id is not None:
+            where.append("account_id = ?")
+            params.append(account_id)
+        if year:
+            where.append("date >= ? AND date < ?")
+            params.extend([f"{year}-01-01", f"{int(year) + 1:04d}-01-01"])
+        where_sql = "WHERE " + " AND ".join(where)
+
+        initialize_db(path)
+        close_shard_connection(path)  # The shard is written through the attachment below
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR IGNORE INTO shard.categories (id, name) SELECT id, name FROM main.categories")
+                conn.execute("INSERT OR IGNORE INTO shard.accounts (id, name) SELECT id, name FROM main.accounts")
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO shard.transactions (id, type, amount_cents, name, category_id, date, account_id)
+                    SELECT id, type, amount_cents, name, category_id, date, account_id
+                    FROM main.transactions {where_sql}
+                ''', params)
+                last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM main.change_log").fetchone()[0]
+                moved = conn.execute(f"DELETE FROM main.transactions {where_sql}", params).rowcount
+                # Readers reload after a move; its per-row entries would only slow them down
+                conn.execute("DELETE FROM main.change_log WHERE seq > ?", (last_seq,))
+                conn.execute("INSERT INTO main.change_log (kind, op) VALUES ('reload', 'shard')")
+                conn.execute("DELETE FROM shard.change_log")
+                rows, first_date, last_date = conn.execute(
+                    "SELECT COUNT(*), MIN(date), MAX(date) FROM shard.transactions"
+                ).fetchone()
+                conn.execute('''
+                    INSERT OR REPLACE INTO main.shards (path, account_id, year, rows, first_date, last_date)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (os.path.basename(path), account_id, year, rows, first_date, last_date))
+                # With WAL the commit is atomic per file only; should the ledger's half fail,
+                # the rows are left in both files and moving them again just deletes them here
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute("DETACH DATABASE shard")
+        _bump_ledger_version()
+        return {'path': path, 'rows': moved, 'first_date': first_date, 'last_date': last_date}
+
+@instrumented
+def fetch_shards():
+    """
+    Lists the shard files of the current ledger.
+
+    Returns:
+        list: One dict per shard with 'path' (resolved next to the ledger), 'account'
+        (None for year shards), 'year', 'rows', 'first_date' and 'last_date'.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT s.path, a.name AS account, s.year, s.rows, s.first_date, s.last_date
+            FROM shards s LEFT JOIN accounts a ON a.id = s.account_id
+            ORDER BY s.first_date
+        ''')
+        directory = os.path.dirname(_db_path)
+        return [dict(row, path=os.path.join(directory, row['path'])) for row in cursor.fetchall()]
+
+def close_shard_connection(path):
+    # Close the pooled connection of one shard file, e.g. before it is written through ATTACH
+    with _pool_lock:
+        pooled = _pool.pop(path, None)
+    if pooled is not None:
+        pooled.close()
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import struct
+import numpy as np
+from analytics import (
+    LedgerColumns, DAY_NUMBER_SQL, MONTH_NUMBER_SQL, TYPE_CODES, account_list, category_list, date_range_clause
+)
+from database import get_connection, iter_transaction_batches
+from money import format_cents
+from profiling import instrumented
+
+EXPORT_BATCH_SIZE = 10000  # Rows fetched from the cursor and written at a time
+EXPORT_COLUMNS = ('id', 'date', 'type', 'name', 'category', 'amount', 'account')
+
+# Snapshot file layout: magic, header length (uint64), JSON header, then each column as
+# a raw little-endian array starting on a SNAPSHOT_ALIGNMENT boundary, so the file can
+# be memory-mapped and the columns used in place without parsing.
+SNAPSHOT_MAGIC = b"MMSNAP01"
+SNAPSHOT_ALIGNMENT = 64
+SNAPSHOT_COLUMNS = (  # (column, dtype), one value per row
+    ('ids', '<i8'),
+    ('amounts', '<i8'),
+    ('days', '<i4'),
+    ('months', '<i4'),
+    ('type_codes', 'i1'),
+    ('category_codes', '<i4'),
+    ('account_codes', '<i4'),
+)
+# Names are stored Arrow-style: 'name_offsets' (rows + 1 positions) into the UTF-8 'names' blob
+
+
+@instrumented
+def export_csv(out, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream transactions to a CSV file, oldest first, one batch at a time.
+    Amounts are written as plain decimal dollars, so the file can be imported again.
+
+    Args:
+        out (file): Text file opened with newline=''.
+        filters (dict, optional): Search filters, e.g. a date range, see database._filter_clause().
+        batch_size (int): Rows fetched and written at a time.
+
+    Returns:
+        int: The number of rows written.
+    """
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    written = 0
+    for batch in iter_transaction_batches(batch_size, filters):
+        writer.writerows(
+            (trans_id, date, trans_type, name, category, format_cents(cents, symbol=False, grouping=False), account)
+            for trans_id, date, trans_type, name, category, cents, account in batch
+        )
+        written += len(batch)
+    return written
+
+
+def _json_rows(batch):
+    # One JSON object per row, with the same keys as the rest of the app uses
+    for trans_id, date, trans_type, name, category, cents, account in batch:
+        yield json.dumps({
+            'id': trans_id, 'date': date, 'type': trans_type,
+            'name': name, 'category': category, 'amount_cents': cents, 'account': account,
+        })
+
+
+@instrumented
+def export_jsonl(out, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream transactions as JSON Lines (one object per line), oldest first.
+    Arguments and return value as for export_csv().
+    """
+    written = 0
+    for batch in iter_transaction_batches(batch_size, filters):
+        out.write("\n".join(_json_rows(batch)))
+        out.write("\n")
+        written += len(batch)
+    return written
+
+
+@instrumented
+def export_json(out, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream transactions as a single JSON array, oldest first, written element by
+    element instead of built in memory. Arguments and return value as for export_csv().
+    """
+    written = 0
+    out.write("[")
+    for batch in iter_transaction_batches(batch_size, filters):
+        out.write(",\n  " if written else "\n  ")
+        out.write(",\n  ".join(_json_rows(batch)))
+        written += len(batch)
+    out.write("\n]\n" if written else "]\n")
+    return written
+
+
+def _align(offset):
+    return -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+@instrumented
+def export_snapshot(path, date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Write the ledger (or a date-range slice) as a binary columnar snapshot that
+    load_snapshot() memory-maps for instant analytics startup.
+    Row and name-byte counts are read first so every column is laid out up front;
+    the cursor is then copied batch by batch straight into the memory-mapped file.
+    The file is written under a temporary name and renamed when complete.
+
+    Args:
+        path (str): The snapshot file to write.
+        date_from (str, optional): First ISO date to include.
+        date_to (str, optional): Last ISO date to include.
+        batch_size (int): Rows copied from the cursor at a time.
+
+    Returns:
+        int: The number of rows written.
+    """
+    where_sql, params = date_range_clause(date_from, date_to)
+    temp_path = path + ".tmp"
+    with get_connection() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")  # Counts and rows come from the same read snapshot
+        rows, name_bytes = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(length(CAST(name AS BLOB))), 0) FROM transactions {where_sql}", params
+        ).fetchone()
+
+        layout = {}
+        offset = 0
+        for column, dtype in SNAPSHOT_COLUMNS + (('name_offsets', '<i8'),):
+            length = rows + 1 if column == 'name_offsets' else rows
+            layout[column] = [dtype, offset, length]
+            offset = _align(offset + length * np.dtype(dtype).itemsize)
+        layout['names'] = ['u1', offset, name_bytes]
+        header = json.dumps({
+            'rows': rows,
+            'date_from': date_from,
+            'date_to': date_to,
+            'type_codes': TYPE_CODES,
+            'categories': category_list(conn),
+            'accounts': account_list(conn),
+            'columns': layout,
+        }).encode('utf-8')
+        data_start = _align(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+        with open(temp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack("<Q", len(header)) + header)
+            f.truncate(data_start + offset + name_bytes)
+        try:
+            mapped = np.memmap(temp_path, dtype=np.uint8, mode='r+')
+            arrays = _column_views(mapped, data_start, layout)
+            arrays['name_offsets'][0] = 0
+
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f'''
+                SELECT id, amount_cents, {DAY_NUMBER_SQL}, {MONTH_NUMBER_SQL}, type = 'expense', category_id,
+                       account_id, CAST(name AS BLOB)
+                FROM transactions {where_sql}
+                ORDER BY date, id
+            ''', params)
+            filled = name_end = 0
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                end = filled + len(batch)
+                *values, names = zip(*batch)
+                for (column, _), column_values in zip(SNAPSHOT_COLUMNS, values):
+                    arrays[column][filled:end] = column_values
+                lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+                arrays['name_offsets'][filled + 1:end + 1] = name_end + np.cumsum(lengths)
+                blob = b"".join(names)
+                arrays['names'][name_end:name_end + len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+                filled, name_end = end, name_end + len(blob)
+            mapped.flush()
+            del arrays, mapped  # Release the mapping before the file is renamed
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return rows
+
+
+def _column_views(mapped, data_start, layout):
+    # Typed, zero-copy views of every column in a memory-mapped snapshot
+    views = {}
+    for column, (dtype, offset, length) in layout.items():
+        start = data_start + offset
+        views[column] = mapped[start:start + length * np.dtype(dtype).itemsize].view(dtype)
+    return views
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot written by export_snapshot().
+    Columns are read lazily by the OS as they are touched, so opening is instant
+    regardless of size. Rows are sorted by date, so date ranges are sliced with a
+    binary search instead of a scan.
+
+    Attributes:
+        rows (int): Number of transactions in the snapshot.
+        categories (list): Category names indexed by category ID.
+        accounts (list): Account names indexed by account ID.
+        arrays (dict): Column name -> read-only numpy view, see SNAPSHOT_COLUMNS.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic = f.read(len(SNAPSHOT_MAGIC))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Not a Money Manager snapshot: {path}")
+            (header_length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length))
+        mapped = np.memmap(path, dtype=np.uint8, mode='r')
+        self.rows = header['rows']
+        self.date_from = header['date_from']
+        self.date_to = header['date_to']
+        self.categories = header['categories']
+        self.accounts = header['accounts']
+        self.arrays = _column_views(mapped, _align(len(SNAPSHOT_MAGIC) + 8 + header_length), header['columns'])
+
+    def __len__(self):
+        return self.rows
+
+    def row_range(self, date_from=None, date_to=None):
+        """(start, stop) row indices of the transactions between two ISO dates, inclusive."""
+        days = self.arrays['days']
+        start = 0 if not date_from else int(np.searchsorted(days, _day_number(date_from), 'left'))
+        stop = len(days) if not date_to else int(np.searchsorted(days, _day_number(date_to), 'right'))
+        return start, max(start, stop)
+
+    def columns(self, date_from=None, date_to=None):
+        """The snapshot (or a date-range slice of it) as LedgerColumns, without copying."""
+        start, stop = self.row_range(date_from, date_to)
+        a = self.arrays
+        return LedgerColumns(
+            a['amounts'][start:stop], a['days'][start:stop], a['months'][start:stop],
+            a['type_codes'][start:stop], a['category_codes'][start:stop], self.categories,
+        )
+
+    def iter_transactions(self, start=0, stop=None):
+        """Yield rows start..stop as transaction dicts (with 'amount_cents'), e.g. to inspect or restore a backup."""
+        a = self.arrays
+        stop = self.rows if stop is None else stop
+        types = {code: name for name, code in TYPE_CODES.items()}
+        offsets, names = a['name_offsets'], a['names']
+        for i in range(start, stop):
+            yield {
+                'id': int(a['ids'][i]),
+                'type': types[int(a['type_codes'][i])],
+                'amount_cents': int(a['amounts'][i]),
+                'name': names[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8'),
+                'category': self.categories[a['category_codes'][i]],
+                'date': str(np.datetime64(int(a['days'][i]), 'D')),
+                'account': self.accounts[a['account_codes'][i]],
+            }
+
+
+def _day_number(iso_date):
+    # Days since 1970-01-01, as stored in the 'days' column
+    return np.datetime64(iso_date, 'D').astype(np.int64)
+
+
+@instrumented
+def load_snapshot(path, date_from=None, date_to=None):
+    """
+    Memory-map a snapshot and return it (or a date-range slice) as LedgerColumns,
+    ready for the analytics functions, without querying the database.
+    """
+    return Snapshot(path).columns(date_from, date_to)
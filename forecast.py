@@ -0,0 +1,170 @@
+import calendar
+from datetime import date, timedelta
+from itertools import accumulate
+
+FORECAST_MONTHS = 12  # Months projected by default, starting with the current one
+FREQUENCIES = {  # Step between occurrences as (days, months)
+    'weekly': (7, 0),
+    'biweekly': (14, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+    'yearly': (0, 12),
+}
+
+
+def add_months(day, months):
+    """Same day 'months' later, clamped to the end of shorter months (Jan 31 + 1 -> Feb 28/29)."""
+    index = day.month - 1 + months
+    year, month = day.year + index // 12, index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def nth_occurrence(start, frequency, n):
+    # Counted from the start date each time, so clamped month ends don't drift (Jan 31, Feb 28, Mar 31)
+    days, months = FREQUENCIES[frequency]
+    return start + timedelta(days=days * n) if days else add_months(start, months * n)
+
+
+def _index_before(start, frequency, day):
+    # An occurrence number at or shortly before 'day', so callers don't walk from the start date
+    days, months = FREQUENCIES[frequency]
+    if days:
+        return max(0, (day - start).days // days)
+    return max(0, ((day.year - start.year) * 12 + day.month - start.month) // months - 1)
+
+
+def next_occurrence(rule, after):
+    """
+    The first date after 'after' on which a rule fires, ignoring its end date.
+
+    Args:
+        rule (dict): A rule as returned by database.fetch_recurring_rules().
+        after (datetime.date): The day to look after.
+
+    Returns:
+        datetime.date: The next occurrence.
+    """
+    start = date.fromisoformat(rule['start_date'])
+    n = _index_before(start, rule['frequency'], after)
+    while True:
+        day = nth_occurrence(start, rule['frequency'], n)
+        if day > after:
+            return day
+        n += 1
+
+
+def occurrences(rule, first, last):
+    """
+    Dates on which a recurring rule fires between two dates (inclusive).
+    Occurrences before the rule's 'next_date' (already posted) or after its
+    'end_date' are left out.
+
+    Args:
+        rule (dict): A rule as returned by database.fetch_recurring_rules().
+        first (datetime.date): First day of the range.
+        last (datetime.date): Last day of the range.
+
+    Returns:
+        list: datetime.date objects in order.
+    """
+    start = date.fromisoformat(rule['start_date'])
+    first = max(first, date.fromisoformat(rule['next_date']))
+    if rule['end_date']:
+        last = min(last, date.fromisoformat(rule['end_date']))
+    if last < first:
+        return []
+    n = _index_before(start, rule['frequency'], first)
+    dates = []
+    while True:
+        day = nth_occurrence(start, rule['frequency'], n)
+        if day > last:
+            return dates
+        if day >= first:
+            dates.append(day)
+        n += 1
+
+
+def signed_amount(rule_or_transaction):
+    # Income adds to the balance, expenses subtract from it
+    amount = rule_or_transaction['amount_cents']
+    return amount if rule_or_transaction['type'] == 'income' else -amount
+
+
+class Forecast:
+    """
+    Projected month-end balances for the current month and the next ones.
+
+    Each rule's total per projected month is cached, together with the per-month sum
+    over all rules and its running total. A rule change only recomputes the running
+    total from the first month the rule's totals differ; a new transaction only moves
+    the starting balance, which is added when the series is read.
+
+    Attributes:
+        today (datetime.date): Day the projection starts from.
+        months (int): Number of months projected.
+        balance (int): Current balance in cents.
+    """
+
+    def __init__(self, balance, rules, months=FORECAST_MONTHS, today=None):
+        self.today = today or date.today()
+        self.months = months
+        self.balance = balance
+        self.first_month = self.today.year * 12 + self.today.month - 1
+        last_month = self.first_month + months - 1
+        year, month = divmod(last_month, 12)
+        self.last_day = date(year, month + 1, calendar.monthrange(year, month + 1)[1])
+        self.rule_totals = {}  # Rule ID -> cents per projected month
+        self.monthly = [0] * months  # Sum over all rules per projected month
+        for rule in rules:
+            totals = self._rule_totals(rule)
+            self.rule_totals[rule['id']] = totals
+            self.monthly = [a + b for a, b in zip(self.monthly, totals)]
+        self.cumulative = list(accumulate(self.monthly))
+
+    def _rule_totals(self, rule):
+        # Signed cents the rule adds in each projected month
+        totals = [0] * self.months
+        amount = signed_amount(rule)
+        for day in occurrences(rule, self.today, self.last_day):
+            totals[day.year * 12 + day.month - 1 - self.first_month] += amount
+        return totals
+
+    def _replace_totals(self, rule_id, totals):
+        # Swap one rule's per-month totals and update the running total from the first changed month
+        old = self.rule_totals.pop(rule_id, [0] * self.months)
+        if totals is not None:
+            self.rule_totals[rule_id] = totals
+        else:
+            totals = [0] * self.months
+        changed = [i for i in range(self.months) if old[i] != totals[i]]
+        if not changed:
+            return
+        for i in changed:
+            self.monthly[i] += totals[i] - old[i]
+        running = self.cumulative[changed[0] - 1] if changed[0] else 0
+        for i in range(changed[0], self.months):
+            running += self.monthly[i]
+            self.cumulative[i] = running
+
+    def set_rule(self, rule):
+        """Add a rule, or update one that changed (e.g. after it was posted)."""
+        self._replace_totals(rule['id'], self._rule_totals(rule))
+
+    def remove_rule(self, rule_id):
+        self._replace_totals(rule_id, None)
+
+    def add_to_balance(self, cents):
+        """A transaction was added (or removed, with negative cents); O(1)."""
+        self.balance += cents
+
+    def series(self):
+        """
+        Returns:
+            dict: 'labels' ('MM-YYYY', current month first) and 'balance' (projected
+            balance at the end of each month, in cents).
+        """
+        labels = []
+        for month in range(self.first_month, self.first_month + self.months):
+            year, month = divmod(month, 12)
+            labels.append(f"{month + 1:02d}-{year}")
+        return {'labels': labels, 'balance': [self.balance + total for total in self.cumulative]}
@@ -1,13 +1,41 @@
+import os
+from bisect import bisect_left
 import customtkinter as ctk
-from money_manager import MoneyManager
+from money_manager import MoneyManager, BUDGET_WARNING
 import tkinter.messagebox as messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
+import tkinter.filedialog as filedialog
+import tkinter.font as tkfont
+import profiling
+from profiling import instrumented
+from datetime import datetime
+from database import DB_DATE_FORMAT, DEFAULT_ACCOUNT, set_commit_delay
+from forecast import FREQUENCIES
+from money import to_cents, format_cents
+from ledger_service import LedgerService
+
+DISPLAY_DATE_FORMAT = "%B %d, %Y"  # Human-readable format shown in the transaction log
+LOG_FONT = ("Courier", 12)  # Monospaced font for aligned layout
+LOG_ROW_FORMAT = "{:<23}  {:<10}  {:<24}  {:>10}  {:<15}\n"
+LOG_HEADER_LINES = 2  # Headings and separator line above the rows
+SEARCH_DEBOUNCE_MS = 250  # Quiet time after the last keystroke before a search runs
+TYPE_FILTERS = {"All types": None, "Income": "income", "Expense": "expense"}
+ALL_ACCOUNTS = "All accounts"  # Account filter choice that shows every account
+NEW_ACCOUNT = "New account..."  # Account menu choice that creates an account
+GROUP_COMMIT_SECONDS = 0.5  # Edits made within this window share one commit
+RULE_TYPES = {"Expense": "expense", "Income": "income"}
+CHANGE_POLL_MS = 1000  # How often changes made by other processes are picked up
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("green")
 
+
+def format_display_date(date_str):
+    """Convert a stored ISO date ("YYYY-MM-DD") to the human-readable display format."""
+    try:
+        return datetime.strptime(date_str, DB_DATE_FORMAT).strftime(DISPLAY_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return date_str  # Show unparseable dates as they are stored
+
 class MoneyManagerApp(ctk.CTk):
     
     def __init__(self):
@@ -17,7 +45,15 @@ class MoneyManagerApp(ctk.CTk):
         self.geometry("800x700")
 
         self.manager = MoneyManager(self)
+        # All MoneyManager calls run on the service's worker thread
+        self.service = LedgerService(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.selected_transaction_id = None  # Stores ID of selected transaction for editing/deleting
+        self.selected_transaction_ids = set()  # All selected IDs; Ctrl+click adds rows for bulk delete
+        set_commit_delay(GROUP_COMMIT_SECONDS)  # Rapid edits are committed together
+        self.report_cache = None  # reports.ReportCache, created on the first report
+        self.report_window = None
+        self.report_canvas = None
 
         # --- Balance Display ---
         self.balance_frame = ctk.CTkFrame(self)
@@ -25,7 +61,6 @@ class MoneyManagerApp(ctk.CTk):
 
         self.balance_label = ctk.CTkLabel(self.balance_frame, text="Balance: $0.00")
         self.balance_label.pack()
-        self.update_balance()  # Initialize balance display
 
         # --- Transaction Input Fields ---
         self.transaction_frame = ctk.CTkFrame(self)
@@ -39,6 +74,18 @@ class MoneyManagerApp(ctk.CTk):
 
         self.category_entry = ctk.CTkEntry(self.transaction_frame, placeholder_text="Category")
         self.category_entry.pack(pady=5, padx=10, fill="x")
+        self.category_entry.bind("<KeyRelease>", self.complete_category)
+
+        # Account for new transactions and imports; the last choice creates an account
+        self.current_account = DEFAULT_ACCOUNT
+        self.account_menu = ctk.CTkOptionMenu(
+            self.transaction_frame, values=[DEFAULT_ACCOUNT, NEW_ACCOUNT], command=self.choose_account
+        )
+        self.account_menu.pack(pady=5, padx=10, anchor="w")
+
+        # Known categories for autocomplete, sorted case-insensitively for prefix lookups
+        self.category_names = []
+        self.category_keys = []  # Case-folded names, parallel to category_names
 
         # --- Buttons to Add Income or Expense ---
         self.income_button = ctk.CTkButton(self.transaction_frame, text="Add Income", command=self.add_income)
@@ -47,6 +94,13 @@ class MoneyManagerApp(ctk.CTk):
         self.expense_button = ctk.CTkButton(self.transaction_frame, text="Add Expense", command=self.add_expense)
         self.expense_button.pack(side="left", padx=10, pady=5)
 
+        # --- Bulk Import from a bank statement (CSV/OFX) ---
+        self.import_button = ctk.CTkButton(self.transaction_frame, text="Import...", command=self.import_statement)
+        self.import_button.pack(side="left", padx=10, pady=5)
+
+        self.import_progress = ctk.CTkProgressBar(self.transaction_frame)
+        self.import_progress.set(0)  # Shown only while an import is running
+
         # --- Transaction Log Display ---
         self.transaction_log_frame = ctk.CTkFrame(self)
         self.transaction_log_frame.pack(pady=10, padx=20, fill="both", expand=True)
@@ -54,14 +108,70 @@ class MoneyManagerApp(ctk.CTk):
         self.transaction_log_label = ctk.CTkLabel(self.transaction_log_frame, text="Transactions:")
         self.transaction_log_label.pack(anchor="w", padx=10)
 
-        # Multiline textbox to show transaction list
+        # --- Search and Filters ---
+        # Typing restarts a short timer; the search runs once the user pauses
+        self.log_filters = {}  # Filters applied to the log (see database._filter_clause)
+        self.search_after_id = None
+        self.filter_frame = ctk.CTkFrame(self.transaction_log_frame, fg_color="transparent")
+        self.filter_frame.pack(padx=10, fill="x")
+
+        self.search_entry = ctk.CTkEntry(self.filter_frame, placeholder_text="Search name or category")
+        self.search_entry.pack(side="left", padx=(0, 5), fill="x", expand=True)
+
+        self.type_filter = ctk.CTkOptionMenu(
+            self.filter_frame, values=list(TYPE_FILTERS), width=110, command=lambda choice: self.apply_filters()
+        )
+        self.type_filter.pack(side="left", padx=5)
+
+        self.account_filter = ctk.CTkOptionMenu(
+            self.filter_frame, values=[ALL_ACCOUNTS], width=120, command=lambda choice: self.apply_filters()
+        )
+        self.account_filter.pack(side="left", padx=5)
+
+        self.filter_entries = {}
+        for key, placeholder, width in (
+            ('category', "Category", 100),
+            ('min_cents', "Min $", 60),
+            ('max_cents', "Max $", 60),
+            ('date_from', "From YYYY-MM-DD", 120),
+            ('date_to', "To YYYY-MM-DD", 120),
+        ):
+            entry = ctk.CTkEntry(self.filter_frame, placeholder_text=placeholder, width=width)
+            entry.pack(side="left", padx=5)
+            self.filter_entries[key] = entry
+
+        for entry in (self.search_entry, *self.filter_entries.values()):
+            entry.bind("<KeyRelease>", self.schedule_search)
+        self.filter_entries['category'].bind("<KeyRelease>", self.complete_category, add="+")
+
+        # Virtualized log: the textbox only ever holds the rows that fit in the viewport,
+        # and the scrollbar pages through the ledger in the database.
+        self.log_offset = 0  # Position of the first visible row in the full ledger
+        self.log_target = 0  # Offset of the most recently requested page
+        self.log_total = 0  # Number of transactions in the ledger
+        self.log_rows = []  # Transactions currently rendered
+        self.log_page_size = 20  # Visible rows; recalculated when the textbox is resized
+        self.log_line_height = tkfont.Font(family=LOG_FONT[0], size=LOG_FONT[1]).metrics("linespace")
+        self.transactions_display_map = {}  # Textbox line -> transaction ID, current page only
+
+        self.transaction_log_scrollbar = ctk.CTkScrollbar(self.transaction_log_frame, command=self.on_log_scrollbar)
+        self.transaction_log_scrollbar.pack(side="right", fill="y", padx=(0, 10), pady=10)
+
+        # Multiline textbox to show the visible part of the transaction list
         self.transaction_log_text = ctk.CTkTextbox(
             self.transaction_log_frame,
             height=250,
-            font=("Courier", 12)  # Monospaced font for aligned layout
+            font=LOG_FONT,
+            wrap="none",
+            activate_scrollbars=False  # Scrolling is handled by the log scrollbar
         )
         self.transaction_log_text.pack(padx=10, pady=10, fill="both", expand=True)
         self.transaction_log_text.bind("<Button-1>", self.select_transaction)  # Click to select transaction
+        self.transaction_log_text.bind("<Control-Button-1>", self.toggle_transaction)  # Ctrl+click to select several
+        self.transaction_log_text.bind("<Configure>", self.on_log_resize)
+        self.transaction_log_text.bind("<MouseWheel>", self.on_log_mousewheel)
+        self.transaction_log_text.bind("<Button-4>", lambda event: self.scroll_transaction_log(-3))  # X11 wheel up
+        self.transaction_log_text.bind("<Button-5>", lambda event: self.scroll_transaction_log(3))  # X11 wheel down
 
         # --- Edit and Delete Buttons for Selected Transaction ---
         self.edit_button = ctk.CTkButton(self, text="Edit Selected", command=self.edit_selected_transaction)
@@ -70,12 +180,46 @@ class MoneyManagerApp(ctk.CTk):
         self.delete_button = ctk.CTkButton(self, text="Delete Selected", command=self.delete_selected_transaction)
         self.delete_button.pack(pady=5)
 
-        self.refresh_transaction_log()  # Initial load of transactions
+        # --- Undo / Redo and bulk recategorize ---
+        self.history_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.history_frame.pack(pady=5)
+
+        self.undo_button = ctk.CTkButton(self.history_frame, text="Undo", command=self.undo, state="disabled")
+        self.undo_button.pack(side="left", padx=5)
+
+        self.redo_button = ctk.CTkButton(self.history_frame, text="Redo", command=self.redo, state="disabled")
+        self.redo_button.pack(side="left", padx=5)
+
+        self.recategorize_button = ctk.CTkButton(
+            self.history_frame, text="Recategorize...", command=self.recategorize_dialog
+        )
+        self.recategorize_button.pack(side="left", padx=5)
+
+        self.recurring_button = ctk.CTkButton(self.history_frame, text="Recurring...", command=self.recurring_dialog)
+        self.recurring_button.pack(side="left", padx=5)
+
+        self.budget_button = ctk.CTkButton(self.history_frame, text="Budgets...", command=self.budget_dialog)
+        self.budget_button.pack(side="left", padx=5)
+
+        self.bind("<Control-z>", lambda event: self.undo())
+        self.bind("<Control-y>", lambda event: self.redo())
+        self.bind("<Control-Z>", lambda event: self.redo())  # Ctrl+Shift+Z
+
 
         # --- Report ---
         self.report_button = ctk.CTkButton(self, text="Run Report", command=self.run_report)
         self.report_button.pack(pady=10)
 
+        # Optional diagnostics window with timing data (F12)
+        self.bind("<F12>", lambda event: self.show_diagnostics())
+
+        # Once the window has painted, post recurring transactions that fell due and load
+        # the balance and transactions, so startup doesn't wait on the ledger
+        self.after_idle(self.post_recurring)
+
+        # Pick up what other windows or scripts write to the same ledger
+        self.poll_after_id = self.after(CHANGE_POLL_MS, self.poll_changes)
+
     
     def add_income(self):
         self.add_transaction('income')
@@ -85,6 +229,7 @@ class MoneyManagerApp(ctk.CTk):
         self.add_transaction('expense')
 
     
+    @instrumented
     def add_transaction(self, type_):
         """
         Adds a new transaction (income or expense) to the database.
@@ -100,65 +245,405 @@ class MoneyManagerApp(ctk.CTk):
             if not name or not category or not amount:
                 raise ValueError("One or more fields are invalid.")
 
-            # Attempt to convert the amount to a float and validate it
+            # Attempt to convert the amount to whole cents and validate it
             try:
-                amount = float(amount)
+                amount = to_cents(amount)
                 if amount <= 0:
                     raise ValueError("Amount must be greater than zero.")
             except ValueError:
                 raise ValueError("Amount must be a valid number.")  # If conversion fails, show an error message
 
-            # Add the transaction based on its type (income or expense)
+            # Add the transaction based on its type (income or expense) on the worker thread
             if type_ == 'income':
-                self.manager.add_income(amount, name, category)  # Call manager to add income
+                add = self.manager.add_income  # Call manager to add income
             else:
-                self.manager.add_expense(amount, name, category)  # Call manager to add expense
+                add = self.manager.add_expense  # Call manager to add expense
+            self.service.submit(add, amount, name, category, self.current_account, on_done=self.on_transaction_added)
 
             # Clear the input fields after successful transaction addition
             self.name_entry.delete(0, 'end')
             self.amount_entry.delete(0, 'end')
             self.category_entry.delete(0, 'end')
 
-            # Update balance and refresh the transaction log to reflect changes
-            self.update_balance()
-            self.refresh_transaction_log()
-
         except ValueError as e:
             # Show an error message if there is any invalid input
             messagebox.showerror("Invalid Entry", str(e))
 
     
+    @instrumented
+    def import_statement(self):
+        """
+        Imports a CSV or OFX/QFX bank statement chosen by the user.
+        Progress is shown in a progress bar; balance and log are refreshed once at the end.
+        """
+        path = filedialog.askopenfilename(
+            title="Import Transactions",
+            filetypes=[("Statements", "*.csv *.ofx *.qfx"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+
+        self.import_progress.set(0)
+        self.import_progress.pack(side="left", padx=10, pady=5, fill="x", expand=True)
+
+        self.import_button.configure(state="disabled")
+
+        def on_progress(rows_imported, fraction_done):
+            # Called on the worker thread; hand the update to the Tk thread
+            self.service.post(self.import_progress.set, fraction_done)
+
+        def on_done(result):
+            imported, skipped = result
+            self.finish_import()
+            messagebox.showinfo("Import Complete", f"Imported {imported:,} transactions ({skipped:,} rows skipped).")
+
+        def on_error(e):
+            self.finish_import()
+            messagebox.showerror("Import Failed", str(e))
+
+        self.service.submit(
+            self.manager.import_file, path, on_progress, self.current_account, on_done=on_done, on_error=on_error
+        )
+
+
+    def finish_import(self):
+        self.import_progress.pack_forget()
+        self.import_button.configure(state="normal")
+        self.refresh_views()
+
+    
+    def on_transaction_added(self, alerts):
+        # add_expense returns the budget alerts of the expense's category
+        self.refresh_views()
+        for alert in alerts or ():
+            messagebox.showwarning("Budget", (
+                f"{alert['category']}: {format_cents(alert['spent_cents'])} spent this month "
+                f"of a {format_cents(alert['limit_cents'])} budget."
+            ))
+
+
+    def post_recurring(self):
+        # Post the recurring transactions due by today, then show the ledger
+        self.service.submit(
+            self.manager.post_recurring, on_done=lambda _: self.refresh_views(), on_error=self.show_history_error
+        )
+
+
+    def poll_changes(self):
+        # Ask the manager for changes other processes committed, then poll again
+        def schedule_next(_=None):
+            self.poll_after_id = self.after(CHANGE_POLL_MS, self.poll_changes)
+
+        def on_done(changes):
+            if changes:
+                self.apply_external_changes(changes)
+            schedule_next()
+
+        self.service.submit(self.manager.poll_changes, on_done=on_done, on_error=schedule_next)
+
+
+    @instrumented
+    def apply_external_changes(self, changes):
+        """
+        Bring the window up to date with changes made by other processes (see
+        MoneyManager.poll_changes). The balance comes from the already updated cache.
+        New or deleted rows shift the log, so its visible page is fetched again; edits
+        to rows on screen are redrawn in place from a primary-key lookup.
+        """
+        self.update_balance()
+        self.update_history()  # The journal is cleared when others change the ledger
+        if changes['reload'] or changes['inserted'] or changes['deleted']:
+            self.refresh_transaction_log()
+            self.update_categories()
+            return
+        visible = set(self.transactions_display_map.values()) & changes['updated']
+        if not visible:
+            return
+
+        def patch_rows(updated):
+            if any(row['id'] in updated and updated[row['id']]['date'] != row['date'] for row in self.log_rows):
+                self.refresh_transaction_log()  # A new date moves the row elsewhere in the log
+                return
+            self.log_rows = [updated.get(row['id'], row) for row in self.log_rows]
+            self.render_transaction_log()
+
+        self.service.submit(self.manager.get_transactions_by_ids, visible, on_done=patch_rows)
+        self.update_categories()
+
+
+    def refresh_views(self):
+        # Update balance and refresh the transaction log to reflect changes
+        self.update_balance()
+        self.refresh_transaction_log()
+        self.update_categories()
+        self.update_history()
+
+
+    def update_history(self):
+        # Show what Undo/Redo would do, and disable them when there is nothing to do
+        def show_history(labels):
+            for button, verb, label in zip((self.undo_button, self.redo_button), ("Undo", "Redo"), labels):
+                if label:
+                    button.configure(text=f"{verb} {label}", state="normal")
+                else:
+                    button.configure(text=verb, state="disabled")
+
+        self.service.submit(self.manager.history, key="history", on_done=show_history)
+
+
+    @instrumented
+    def undo(self):
+        self.service.submit(self.manager.undo, on_done=lambda _: self.refresh_views(), on_error=self.show_history_error)
+
+
+    @instrumented
+    def redo(self):
+        self.service.submit(self.manager.redo, on_done=lambda _: self.refresh_views(), on_error=self.show_history_error)
+
+
+    def show_history_error(self, error):
+        messagebox.showerror("Error", f"Could not apply the change: {error}")
+        self.refresh_views()
+
+
+    def update_categories(self):
+        def store_categories(names):
+            self.category_names = sorted(names, key=str.casefold)
+            self.category_keys = [name.casefold() for name in self.category_names]
+
+        self.service.submit(self.manager.get_categories, key="categories", on_done=store_categories)
+
+
+    def complete_category(self, event):
+        """
+        Inline autocomplete for category entries: after each typed character, fill in
+        the rest of the first known category starting with the text before the cursor
+        and select the filled-in part, so typing on simply replaces it.
+        """
+        if not event.char or not event.char.isprintable():
+            return  # Backspace, arrows and modifiers leave the text alone
+        entry = event.widget
+        typed = entry.get()[:entry.index("insert")]
+        prefix = typed.casefold()
+        i = bisect_left(self.category_keys, prefix)
+        if i == len(self.category_keys) or not self.category_keys[i].startswith(prefix):
+            return
+        match = self.category_names[i]
+        if len(match) > len(typed):
+            entry.delete(0, "end")
+            entry.insert(0, typed + match[len(typed):])
+            entry.select_range(len(typed), "end")
+            entry.icursor(len(typed))
+
+    
+    @instrumented
     def update_balance(self):
-        balance = self.manager.get_balance()
-        self.balance_label.configure(text=f"Balance: ${balance:.2f}")
+        # Total balance, plus each account's when there is more than one
+        def show_balances(balances):
+            text = f"Balance: {format_cents(sum(balances.values()))}"
+            if len(balances) > 1:
+                text += "  (" + ", ".join(f"{account}: {format_cents(cents)}" for account, cents in balances.items()) + ")"
+            self.balance_label.configure(text=text)
+            self.update_account_menus(list(balances))
+
+        self.service.submit(self.manager.get_account_balances, key="balance", on_done=show_balances)
+
+
+    def update_account_menus(self, accounts):
+        # Offer every account in the input form and the filter bar, keeping the current choices
+        self.account_menu.configure(values=accounts + [NEW_ACCOUNT])
+        self.account_filter.configure(values=[ALL_ACCOUNTS] + accounts)
+        if self.current_account not in accounts:
+            self.current_account = DEFAULT_ACCOUNT if DEFAULT_ACCOUNT in accounts else accounts[0]
+            self.account_menu.set(self.current_account)
+        if self.account_filter.get() not in accounts:
+            self.account_filter.set(ALL_ACCOUNTS)
+
+
+    def choose_account(self, choice):
+        if choice != NEW_ACCOUNT:
+            self.current_account = choice
+            return
+        self.account_menu.set(self.current_account)  # Until the new account exists
+        name = (ctk.CTkInputDialog(title="New Account", text="Account name:").get_input() or "").strip()
+        if not name or name == NEW_ACCOUNT:
+            return
+
+        def on_added(_):
+            self.current_account = name
+            self.account_menu.set(name)
+            self.update_balance()
+
+        self.service.submit(self.manager.add_account, name, on_done=on_added)
 
     
+    @instrumented
     def refresh_transaction_log(self):
+        """
+        Reload the visible page of the transaction log after the ledger changed.
+        Only the rows that fit in the viewport are fetched and rendered.
+        """
+        self.load_log_page(self.log_target)
+
+
+    def schedule_search(self, event=None):
+        # Debounce: restart the timer on every keystroke so only the last one searches
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DEBOUNCE_MS, self.apply_filters)
+
+
+    def read_filters(self):
+        """
+        Collect the filter bar into a filters dict for the database.
+        Fields that don't parse (e.g. a half-typed amount or date) are ignored.
+        """
+        filters = {}
+        text = self.search_entry.get().strip()
+        if text:
+            filters['text'] = text
+        trans_type = TYPE_FILTERS.get(self.type_filter.get())
+        if trans_type:
+            filters['type'] = trans_type
+        category = self.filter_entries['category'].get().strip()
+        if category:
+            filters['category'] = category
+        account = self.account_filter.get()
+        if account != ALL_ACCOUNTS:
+            filters['account'] = account
+        for key in ('min_cents', 'max_cents'):
+            try:
+                filters[key] = to_cents(self.filter_entries[key].get())
+            except ValueError:
+                pass
+        for key in ('date_from', 'date_to'):
+            try:
+                value = self.filter_entries[key].get().strip()
+                filters[key] = datetime.strptime(value, DB_DATE_FORMAT).strftime(DB_DATE_FORMAT)
+            except ValueError:
+                pass
+        return filters
+
+
+    @instrumented
+    def apply_filters(self):
+        # Show the first page of matches when the filters changed
+        self.search_after_id = None
+        filters = self.read_filters()
+        if filters == self.log_filters:
+            return
+        self.log_filters = filters
+        self.log_rows = []  # Keyset cursors from the old result set don't apply
+        self.log_offset = 0
+        self.load_log_page(0)
+
+
+    @instrumented
+    def load_log_page(self, offset):
+        """
+        Fetch the page of rows starting at 'offset' on the worker thread and render it.
+        Moving forward within the rendered page uses a (date, id) keyset cursor,
+        any other jump falls back to LIMIT/OFFSET. Superseded requests are dropped.
+        """
+        page_size = self.log_page_size
+        shown_offset, shown_rows = self.log_offset, self.log_rows
+        filters = self.log_filters
+        self.log_target = max(0, offset)
+
+        def fetch_page():
+            total = self.manager.count_transactions(filters)
+            target = max(0, min(offset, total - page_size))
+            step = target - shown_offset
+            if 0 < step <= len(shown_rows):
+                cursor_row = shown_rows[step - 1]
+                rows = self.manager.get_transactions_page(
+                    page_size, after=(cursor_row['date'], cursor_row['id']), filters=filters
+                )
+            else:
+                rows = self.manager.get_transactions_page(page_size, target, filters=filters)
+            return total, target, rows
+
+        def show_page(page):
+            self.log_total, self.log_offset, self.log_rows = page
+            self.log_target = self.log_offset
+            label = f"Transactions ({self.log_total:,} matching):" if filters else "Transactions:"
+            self.transaction_log_label.configure(text=label)
+            self.render_transaction_log()
+
+        self.service.submit(fetch_page, key="log", on_done=show_page)
+
+
+    @instrumented
+    def render_transaction_log(self):
+        # Redraw the textbox from the rows of the current page
         self.transaction_log_text.configure(state="normal")
         self.transaction_log_text.delete(1.0, 'end')
         self.transactions_display_map = {}
 
         # Updated headings with wider columns for alignment
-        headings = "{:<23}  {:<10}  {:<24}  {:>10}  {:<15}\n".format(
-            "Date", "Type", "Name", "Amount", "Category"
-        )
-        self.transaction_log_text.insert("end", headings)
-        self.transaction_log_text.insert("end", "-" * len(headings) + "\n")
+        headings = LOG_ROW_FORMAT.format("Date", "Type", "Name", "Amount", "Category")
+        lines = [headings, "-" * len(headings) + "\n"]
+        selected_lines = []
 
-        for i, transaction in enumerate(self.manager.get_transactions()):
-            display_text = "{:<23}  {:<10}  {:<24}  {:>10}  {:<15}\n".format(
-                transaction['date'],
+        for i, transaction in enumerate(self.log_rows):
+            lines.append(LOG_ROW_FORMAT.format(
+                format_display_date(transaction['date']),
                 transaction['type'],
                 transaction['name'],
-                f"${transaction['amount']:,.2f}",  # Dollar sign included with amount
+                format_cents(transaction['amount_cents']),  # Dollar sign included with amount
                 transaction['category']
-    )
-            self.transaction_log_text.insert("end", display_text)
-            self.transactions_display_map[i + 3] = transaction['id']
+            ))
+            self.transactions_display_map[i + LOG_HEADER_LINES + 1] = transaction['id']
+            if transaction['id'] in self.selected_transaction_ids:
+                selected_lines.append(i + LOG_HEADER_LINES + 1)
+
+        self.transaction_log_text.insert("end", "".join(lines))  # One insert for the whole page
+
+        # Keep the selection highlighted while it is on screen
+        for selected_line in selected_lines:
+            self.transaction_log_text.tag_add("highlight", f"{selected_line}.0", f"{selected_line}.end")
+        self.transaction_log_text.tag_config("highlight", background="#d0eaff")
 
         self.transaction_log_text.configure(state="disabled")
 
+        # Scrollbar shows where the page sits in the whole ledger
+        if self.log_total:
+            first = self.log_offset / self.log_total
+            last = min((self.log_offset + len(self.log_rows)) / self.log_total, 1.0)
+            self.transaction_log_scrollbar.set(first, last)
+        else:
+            self.transaction_log_scrollbar.set(0, 1)
+
+
+    def scroll_transaction_log(self, rows):
+        # Move the visible window by a number of rows (negative scrolls up)
+        self.load_log_page(self.log_target + rows)
+
+
+    def on_log_scrollbar(self, action, *args):
+        # Translate scrollbar commands ('moveto' or 'scroll') into page loads
+        if action == "moveto":
+            self.load_log_page(int(float(args[0]) * self.log_total))
+        elif action == "scroll":
+            amount, what = int(args[0]), args[1]
+            step = amount * self.log_page_size if what == "pages" else amount
+            self.scroll_transaction_log(step)
+
+
+    def on_log_mousewheel(self, event):
+        self.scroll_transaction_log(-3 if event.delta > 0 else 3)
+        return "break"  # Don't let the textbox scroll its own content
+
+
+    def on_log_resize(self, event):
+        # Recalculate how many rows fit and re-render only if that changed
+        page_size = max(1, event.height // self.log_line_height - LOG_HEADER_LINES)
+        if page_size != self.log_page_size:
+            self.log_page_size = page_size
+            self.load_log_page(self.log_target)
+
     
+    @instrumented
     def select_transaction(self, event):
         # Enable textbox temporarily
         self.transaction_log_text.configure(state="normal")
@@ -170,6 +655,7 @@ class MoneyManagerApp(ctk.CTk):
         index = self.transaction_log_text.index(f"@{event.x},{event.y}")
         line = int(index.split(".")[0])
         self.selected_transaction_id = self.transactions_display_map.get(line)
+        self.selected_transaction_ids = {self.selected_transaction_id} - {None}
 
         # Apply highlight tag to the selected line
         self.transaction_log_text.tag_add("highlight", f"{line}.0", f"{line}.end")
@@ -179,38 +665,245 @@ class MoneyManagerApp(ctk.CTk):
         self.transaction_log_text.configure(state="disabled")
 
     
+    def toggle_transaction(self, event):
+        # Ctrl+click: add the clicked row to the selection, or remove it if already selected
+        index = self.transaction_log_text.index(f"@{event.x},{event.y}")
+        trans_id = self.transactions_display_map.get(int(index.split(".")[0]))
+        if trans_id is None:
+            return "break"
+        if trans_id in self.selected_transaction_ids:
+            self.selected_transaction_ids.discard(trans_id)
+            if self.selected_transaction_id == trans_id:
+                self.selected_transaction_id = next(iter(self.selected_transaction_ids), None)
+        else:
+            self.selected_transaction_ids.add(trans_id)
+            self.selected_transaction_id = trans_id
+        self.render_transaction_log()
+        return "break"  # Skip the plain-click binding
+
+    
+    @instrumented
     def edit_selected_transaction(self):
         # Retrieve the selected transaction using its ID and open edit window
         if self.selected_transaction_id is None:
             return
 
-        transaction = next((t for t in self.manager.get_transactions() if t['id'] == self.selected_transaction_id), None)
-        if transaction:
-            self.edit_transaction(transaction)
+        def open_editor(transaction):
+            if transaction:
+                self.edit_transaction(transaction)
 
+        self.service.submit(self.manager.get_transaction, self.selected_transaction_id, on_done=open_editor)
 
+
+    @instrumented
     def delete_selected_transaction(self):
         # Confirm and delete the selected transaction by its ID
         if self.selected_transaction_id is None:
             return
-
-        transaction = next((t for t in self.manager.get_transactions() if t['id'] == self.selected_transaction_id), None)
-        if not transaction:
+        if len(self.selected_transaction_ids) > 1:
+            self.delete_selected_transactions()
             return
 
-        # Confirmation box showing the transaction name and amount
-        confirm = messagebox.askyesno(
-            "Confirm Deletion",
-            f"Are you sure you want to delete '{transaction['name']}' for ${transaction['amount']:.2f}?"
+        def confirm_delete(transaction):
+            if not transaction:
+                return
+
+            # Confirmation box showing the transaction name and amount
+            confirm = messagebox.askyesno(
+                "Confirm Deletion",
+                f"Are you sure you want to delete '{transaction['name']}' for {format_cents(transaction['amount_cents'])}?"
+            )
+
+            if confirm:
+                self.selected_transaction_id = None
+                self.selected_transaction_ids = set()
+                self.service.submit(
+                    self.manager.delete_transaction, transaction['id'],
+                    on_done=lambda _: self.refresh_views()
+                )
+
+        self.service.submit(self.manager.get_transaction, self.selected_transaction_id, on_done=confirm_delete)
+
+
+    def delete_selected_transactions(self):
+        # Bulk delete: one confirmation, one transaction, one undo step
+        trans_ids = list(self.selected_transaction_ids)
+        if not messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete {len(trans_ids)} transactions?"):
+            return
+        self.selected_transaction_id = None
+        self.selected_transaction_ids = set()
+        self.service.submit(
+            self.manager.delete_transactions, trans_ids,
+            on_done=lambda _: self.refresh_views(), on_error=self.show_history_error
         )
 
-        if confirm:
-            self.manager.delete_transaction(transaction['id'])
-            self.selected_transaction_id = None
-            self.update_balance()
-            self.refresh_transaction_log()
 
+    def recategorize_dialog(self):
+        """Open a popup that moves every transaction in one category to another."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Recategorize")
+        dialog.geometry("400x220")
+        dialog.lift()
+        dialog.grab_set()
+        dialog.focus_force()
+
+        from_entry = ctk.CTkEntry(dialog, placeholder_text="Move all transactions in category")
+        from_entry.pack(pady=10, padx=20, fill="x")
+        to_entry = ctk.CTkEntry(dialog, placeholder_text="To category")
+        to_entry.pack(pady=10, padx=20, fill="x")
+        for entry in (from_entry, to_entry):
+            entry.bind("<KeyRelease>", self.complete_category)
+
+        def move():
+            old_category, new_category = from_entry.get().strip(), to_entry.get().strip()
+            if not old_category or not new_category:
+                return
+
+            def on_moved(count):
+                dialog.destroy()
+                if not count:
+                    messagebox.showinfo("Recategorize", f"No transactions in '{old_category}'.")
+                self.refresh_views()
+
+            self.service.submit(
+                self.manager.recategorize, old_category, new_category,
+                on_done=on_moved, on_error=self.show_history_error
+            )
+
+        ctk.CTkButton(dialog, text="Move", command=move).pack(pady=20)
+
+
+    def recurring_dialog(self):
+        """Open a popup listing the recurring rules, to add new ones or delete them."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Recurring Transactions")
+        dialog.geometry("560x520")
+        dialog.lift()
+        dialog.focus_force()
+
+        rules_frame = ctk.CTkScrollableFrame(dialog, height=200)
+        rules_frame.pack(pady=10, padx=20, fill="both", expand=True)
+
+        def show_rules(rules):
+            for child in rules_frame.winfo_children():
+                child.destroy()
+            if not rules:
+                ctk.CTkLabel(rules_frame, text="No recurring transactions yet.").pack(anchor="w")
+            for rule in rules:
+                row = ctk.CTkFrame(rules_frame, fg_color="transparent")
+                row.pack(fill="x", pady=2)
+                sign = "+" if rule['type'] == 'income' else "-"
+                ctk.CTkLabel(row, anchor="w", text=(
+                    f"{rule['name']}  {sign}{format_cents(rule['amount_cents'])} {rule['frequency']}  "
+                    f"({rule['category']}, {rule['account']}), next {rule['next_date']}"
+                )).pack(side="left", fill="x", expand=True)
+                ctk.CTkButton(row, text="Delete", width=60, command=lambda rule_id=rule['id']: delete(rule_id)).pack(
+                    side="right"
+                )
+
+        def load_rules():
+            self.service.submit(self.manager.get_recurring, on_done=show_rules)
+
+        def delete(rule_id):
+            self.service.submit(self.manager.delete_recurring, rule_id, on_done=lambda _: load_rules())
+
+        name_entry = ctk.CTkEntry(dialog, placeholder_text="Name (e.g. Rent)")
+        name_entry.pack(pady=5, padx=20, fill="x")
+        amount_entry = ctk.CTkEntry(dialog, placeholder_text="Amount")
+        amount_entry.pack(pady=5, padx=20, fill="x")
+        category_entry = ctk.CTkEntry(dialog, placeholder_text="Category")
+        category_entry.pack(pady=5, padx=20, fill="x")
+        category_entry.bind("<KeyRelease>", self.complete_category)
+        start_entry = ctk.CTkEntry(dialog, placeholder_text="First date YYYY-MM-DD (default: today)")
+        start_entry.pack(pady=5, padx=20, fill="x")
+
+        options = ctk.CTkFrame(dialog, fg_color="transparent")
+        options.pack(pady=5, padx=20, fill="x")
+        type_menu = ctk.CTkOptionMenu(options, values=list(RULE_TYPES), width=110)
+        type_menu.pack(side="left", padx=(0, 5))
+        frequency_menu = ctk.CTkOptionMenu(options, values=list(FREQUENCIES), width=110)
+        frequency_menu.set("monthly")
+        frequency_menu.pack(side="left", padx=5)
+
+        def add():
+            try:
+                name, category = name_entry.get().strip(), category_entry.get().strip()
+                start_date = start_entry.get().strip() or None
+                if not name or not category:
+                    raise ValueError("Name and category are required.")
+                amount = to_cents(amount_entry.get().strip())
+                if amount <= 0:
+                    raise ValueError("Amount must be greater than zero.")
+                if start_date:
+                    datetime.strptime(start_date, DB_DATE_FORMAT)  # Raises ValueError if malformed
+            except ValueError as e:
+                messagebox.showerror("Invalid Entry", str(e), parent=dialog)
+                return
+
+            def on_added(_):
+                for entry in (name_entry, amount_entry, category_entry, start_entry):
+                    entry.delete(0, 'end')
+                load_rules()
+                self.post_recurring()  # A rule starting today or earlier is due straight away
+
+            self.service.submit(
+                self.manager.add_recurring, RULE_TYPES[type_menu.get()], amount, name, category,
+                frequency_menu.get(), start_date, None, self.current_account, on_done=on_added
+            )
+
+        ctk.CTkButton(options, text="Add", command=add).pack(side="right")
+        load_rules()
+
+
+    def budget_dialog(self):
+        """Open a popup showing this month's spending against each budget, to set or remove budgets."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Budgets")
+        dialog.geometry("420x400")
+        dialog.lift()
+        dialog.focus_force()
+
+        status_text = ctk.CTkTextbox(dialog, height=180, font=LOG_FONT, wrap="none")
+        status_text.pack(pady=10, padx=20, fill="both", expand=True)
+
+        def show_status(budgets):
+            status_text.configure(state="normal")
+            status_text.delete("1.0", "end")
+            if not budgets:
+                status_text.insert("end", "No budgets set.\n")
+            for budget in budgets:
+                flag = " !" if budget['spent_cents'] >= budget['limit_cents'] * BUDGET_WARNING else ""
+                status_text.insert("end", (
+                    f"{budget['category'][:16]:<16} {format_cents(budget['spent_cents']):>12} "
+                    f"of {format_cents(budget['limit_cents']):>12}{flag}\n"
+                ))
+            status_text.configure(state="disabled")
+
+        def load_status():
+            self.service.submit(self.manager.budget_status, on_done=show_status)
+
+        category_entry = ctk.CTkEntry(dialog, placeholder_text="Category")
+        category_entry.pack(pady=5, padx=20, fill="x")
+        category_entry.bind("<KeyRelease>", self.complete_category)
+        limit_entry = ctk.CTkEntry(dialog, placeholder_text="Monthly limit (empty removes the budget)")
+        limit_entry.pack(pady=5, padx=20, fill="x")
+
+        def save():
+            category, limit = category_entry.get().strip(), limit_entry.get().strip()
+            if not category:
+                return
+            try:
+                limit_cents = to_cents(limit) if limit else None
+            except ValueError as e:
+                messagebox.showerror("Invalid Entry", str(e), parent=dialog)
+                return
+            self.service.submit(self.manager.set_budget, category, limit_cents, on_done=lambda _: load_status())
+
+        ctk.CTkButton(dialog, text="Set Budget", command=save).pack(pady=10)
+        load_status()
 
+
+    @instrumented
     def edit_transaction(self, transaction):
         """Open a popup window for editing a transaction."""
         
@@ -228,7 +921,7 @@ class MoneyManagerApp(ctk.CTk):
         name_entry.pack(pady=10, padx=20, fill="x")
 
         amount_entry = ctk.CTkEntry(edit_window, placeholder_text="Amount")
-        amount_entry.insert(0, str(transaction['amount']))
+        amount_entry.insert(0, format_cents(transaction['amount_cents'], symbol=False))
         amount_entry.pack(pady=10, padx=20, fill="x")
 
         category_entry = ctk.CTkEntry(edit_window, placeholder_text="Category")
@@ -245,30 +938,73 @@ class MoneyManagerApp(ctk.CTk):
                 return
 
             try:
-                new_amount = float(new_amount)
+                new_amount = to_cents(new_amount)
             except ValueError:
                 return
 
             # Update the transaction and refresh UI
-            if self.manager.edit_transaction(transaction['id'], new_name, new_amount, new_category):
-                self.update_balance()
-                self.refresh_transaction_log()
-                edit_window.destroy()
-            else:
-                print("Error updating transaction")
+            def on_saved(updated):
+                if updated:
+                    self.refresh_views()
+                    edit_window.destroy()
+                else:
+                    print("Error updating transaction")
+
+            self.service.submit(
+                self.manager.edit_transaction, transaction['id'], new_name, new_amount, new_category,
+                on_done=on_saved
+            )
 
         # Save button for the popup
         save_button = ctk.CTkButton(edit_window, text="Save Changes", command=save_changes)
         save_button.pack(pady=20)
 
    
-    def run_report(self):
-        self.show_charts()
+    @instrumented
+    def run_report(self, params=(None, None)):
+        """
+        Show the financial report for (date_from, date_to).
+        Reports are cached by ledger version: an unchanged report reopens instantly,
+        and a changed one only has its affected chart panels updated.
+        """
+        from reports import ReportCache, prepare_report  # matplotlib is only loaded on the first report
+
+        if self.report_cache is None:
+            self.report_cache = ReportCache()
+        entry = self.report_cache.get(params)
+
+        self.report_button.configure(state="disabled")
+
+        def on_error(e):
+            self.report_button.configure(state="normal")
+            messagebox.showerror("Report Failed", str(e))
+
+        def on_done(update):
+            fig = self.report_cache.apply(update)
+            if fig is None:
+                self.run_report(params)  # Cached entry was evicted meanwhile; start over
+            else:
+                self.show_charts(fig)
+
+        def prepare():
+            # Runs on the worker thread: query the data (and build the figure if it isn't cached)
+            forecast = self.manager.get_forecast()
+            return prepare_report(params, entry['version'] if entry else None, entry is not None, forecast)
+
+        self.service.submit(prepare, key="report", on_done=on_done, on_error=on_error)
 
 
-    def show_charts(self):
-        import matplotlib
-        matplotlib.use("Agg")  # Prevents backend conflicts when using Tkinter
+    @instrumented
+    def show_charts(self, fig):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.report_button.configure(state="normal")
+
+        # Reuse the open report window if it already shows this figure
+        if self.report_window is not None and self.report_window.winfo_exists() and self.report_canvas.figure is fig:
+            self.report_canvas.draw_idle()
+            self.report_window.lift()
+            return
 
         # Create a new window to display the financial charts
         report_window = ctk.CTkToplevel(self)
@@ -276,46 +1012,83 @@ class MoneyManagerApp(ctk.CTk):
         report_window.geometry("900x700")
         report_window.attributes("-topmost", True)  # Keep window above others
 
-        # Create a figure with two side-by-side subplots
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 5))
-        
-        # --- Pie Chart: Expenses by Category ---
-        category_data = self.manager.get_expense_by_category()
-        if category_data:
-            ax1.pie(category_data.values(), labels=category_data.keys(), autopct='%1.1f%%', startangle=90)
-            ax1.axis('equal')  # Equal aspect ratio for a circular pie
-            ax1.set_title('Expenses by Category')
-        else:
-            ax1.text(0.5, 0.5, 'No expense data', ha='center', va='center')
-            ax1.axis('off')  # Hide axes when there's no data
-
-        # --- Bar Chart: Monthly Expenses ---
-        monthly_expenses = self.manager.get_monthly_expenses()
-        print("Monthly Expenses:", monthly_expenses)  # Debugging output
-        if monthly_expenses:
-            months = list(monthly_expenses.keys())
-            values = list(monthly_expenses.values())
-            ax2.bar(months, values)
-            ax2.set_title('Monthly Expenses')
-            ax2.set_xlabel('Month')
-            ax2.set_ylabel('Amount')
-        else:
-            ax2.text(0.5, 0.5, 'No monthly data', ha='center', va='center')
-            ax2.axis('off')
-
-        plt.tight_layout()  # Adjust layout to prevent overlap
-
         # Embed the matplotlib figure into the customTkinter window
         canvas = FigureCanvasTkAgg(fig, master=report_window)
         canvas.draw()
         canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.report_window, self.report_canvas = report_window, canvas
 
-        # Ensure matplotlib figure is closed and memory cleaned when window is closed
-        def on_close():
-            plt.close(fig)
-            report_window.destroy()
 
-        report_window.protocol("WM_DELETE_WINDOW", on_close)
-        
-        
+    def show_diagnostics(self):
+        """
+        Open the diagnostics window: per-function timings recorded by profiling.py,
+        with controls to enable recording, export the data as JSON and take a cProfile dump.
+        """
+        window = ctk.CTkToplevel(self)
+        window.title("Diagnostics")
+        window.geometry("1000x500")
+
+        controls = ctk.CTkFrame(window)
+        controls.pack(fill="x", padx=10, pady=5)
+
+        output = ctk.CTkTextbox(window, font=LOG_FONT, wrap="none")
+        output.pack(fill="both", expand=True, padx=10, pady=5)
+
+        def refresh():
+            output.configure(state="normal")
+            output.delete(1.0, "end")
+            if profiling.is_enabled() or profiling.records():
+                output.insert("end", profiling.format_summary())
+            else:
+                output.insert("end", "Timing is off. Turn on 'Record timings' and use the app.")
+            output.configure(state="disabled")
+
+        def toggle_recording():
+            if recording.get():
+                profiling.enable()
+            else:
+                profiling.disable()
+            refresh()
+
+        def clear():
+            profiling.clear()
+            refresh()
+
+        def export_json():
+            path = filedialog.asksaveasfilename(
+                parent=window, defaultextension=".json", filetypes=[("JSON", "*.json")]
+            )
+            if path:
+                profiling.export_json(path)
+
+        def toggle_cprofile():
+            if not profiling.cprofile_running():
+                profiling.start_cprofile()
+                cprofile_button.configure(text="Stop cProfile & Save...")
+                return
+            path = filedialog.asksaveasfilename(
+                parent=window, defaultextension=".prof", filetypes=[("cProfile dump", "*.prof")]
+            )
+            profiling.stop_cprofile(path or os.devnull)
+            cprofile_button.configure(text="Start cProfile")
+
+        recording = ctk.BooleanVar(value=profiling.is_enabled())
+        ctk.CTkSwitch(controls, text="Record timings", variable=recording, command=toggle_recording).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Refresh", command=refresh).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Clear", command=clear).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Export JSON...", command=export_json).pack(side="left", padx=5)
+        cprofile_button = ctk.CTkButton(
+            controls, text="Stop cProfile & Save..." if profiling.cprofile_running() else "Start cProfile",
+            command=toggle_cprofile
+        )
+        cprofile_button.pack(side="left", padx=5)
+
+        refresh()
+
 
+    def on_close(self):
+        # Let the worker finish its current job before the window (and DB connection) go away;
+        # grouped writes are committed when main.py closes the connection
+        self.after_cancel(self.poll_after_id)
+        self.service.shutdown()
+        self.destroy()
@@ -0,0 +1,202 @@
+import csv
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from database import get_connection, insert_transactions, DB_DATE_FORMAT, DEFAULT_ACCOUNT
+from money import to_cents
+from profiling import instrumented
+
+IMPORT_CHUNK_SIZE = 5000  # Rows per executemany batch
+DEFAULT_CATEGORY = "Uncategorized"
+
+# Date formats commonly found in bank exports, tried in order
+IMPORT_DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%m/%d/%y",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%d %b %Y",
+    "%Y%m%d",
+)
+
+# Accepted CSV header names (lower-case) for each field
+CSV_COLUMNS = {
+    'date': ('date', 'posted', 'posting date', 'transaction date'),
+    'name': ('name', 'description', 'payee', 'memo'),
+    'amount': ('amount', 'value'),
+    'debit': ('debit', 'withdrawal'),
+    'credit': ('credit', 'deposit'),
+    'category': ('category',),
+    'type': ('type',),
+}
+
+INCOME_TYPES = {'income', 'credit', 'deposit', 'int', 'div', 'dep', 'directdep'}
+EXPENSE_TYPES = {'expense', 'debit', 'withdrawal', 'payment', 'check', 'fee', 'pos', 'atm'}
+
+OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+@lru_cache(maxsize=4096)
+def parse_import_date(date_str):
+    """
+    Convert a date from a statement file to the ISO format used in the database.
+    Results are cached because exports repeat the same dates many times.
+    Raises ValueError if no known format matches.
+    """
+    date_str = date_str.strip()
+    if len(date_str) > 8 and date_str[:8].isdigit():
+        date_str = date_str[:8]  # OFX timestamps like 20250131120000[-5:EST]
+    for fmt in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).strftime(DB_DATE_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {date_str}")
+
+
+def normalize_transaction(date_str, name, amount_cents, category=None, type_hint=None):
+    """
+    Build a (type, amount_cents, name, category, date) tuple ready for insert_transactions().
+    The type comes from type_hint when it is recognised, otherwise from the sign of the amount.
+    Amounts are always stored as positive numbers of cents.
+    """
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("Missing name")
+    hint = (type_hint or '').strip().lower()
+    if hint in INCOME_TYPES:
+        trans_type = 'income'
+    elif hint in EXPENSE_TYPES:
+        trans_type = 'expense'
+    else:
+        trans_type = 'income' if amount_cents > 0 else 'expense'
+    amount_cents = abs(amount_cents)
+    if amount_cents == 0:
+        raise ValueError("Amount must be greater than zero.")
+    category = (category or '').strip() or DEFAULT_CATEGORY
+    return (trans_type, amount_cents, name, category, parse_import_date(date_str))
+
+
+def _track_progress(lines, state):
+    # Pass lines through while counting the characters read, for progress reporting
+    for line in lines:
+        state['read'] += len(line)
+        yield line
+
+
+def _find_columns(header):
+    """Map each known field to its column index in the CSV header."""
+    header = [h.strip().lower() for h in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    if 'date' not in columns or 'name' not in columns:
+        raise ValueError("CSV file needs a date and a name/description column.")
+    if 'amount' not in columns and 'debit' not in columns and 'credit' not in columns:
+        raise ValueError("CSV file needs an amount (or debit/credit) column.")
+    return columns
+
+
+def read_csv_transactions(path, state):
+    """
+    Generator that yields normalised transactions from a CSV statement, one row at a time.
+    Rows that can't be parsed are counted in state['skipped'] and left out.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(_track_progress(f, state))
+        columns = _find_columns(next(reader, []))
+
+        def cell(row, field):
+            index = columns.get(field)
+            return row[index] if index is not None and index < len(row) else ''
+
+        for row in reader:
+            try:
+                if 'amount' in columns:
+                    amount = to_cents(cell(row, 'amount'))
+                else:
+                    credit = cell(row, 'credit').strip()
+                    debit = cell(row, 'debit').strip()
+                    amount = to_cents(credit) if credit else -to_cents(debit)
+                yield normalize_transaction(
+                    cell(row, 'date'), cell(row, 'name'), amount,
+                    cell(row, 'category'), cell(row, 'type')
+                )
+            except (ValueError, IndexError):
+                state['skipped'] += 1
+
+
+def read_ofx_transactions(path, state):
+    """
+    Generator that yields normalised transactions from an OFX/QFX statement.
+    Handles both SGML (one tag per line) and XML style files by scanning
+    <STMTTRN> blocks tag by tag, so the file is never loaded whole.
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        current = None
+        for line in _track_progress(f, state):
+            for match in OFX_TAG.finditer(line):
+                tag, value = match.group(1).upper(), match.group(2).strip()
+                if tag == 'STMTTRN':
+                    current = {}
+                elif current is not None:
+                    current[tag] = value
+            if current is not None and '</STMTTRN>' in line.upper():
+                try:
+                    yield normalize_transaction(
+                        current.get('DTPOSTED', ''),
+                        current.get('NAME') or current.get('MEMO'),
+                        to_cents(current.get('TRNAMT', '')),
+                        None,
+                        current.get('TRNTYPE'),
+                    )
+                except ValueError:
+                    state['skipped'] += 1
+                current = None
+
+
+@instrumented
+def import_transactions(path, progress_callback=None, chunk_size=IMPORT_CHUNK_SIZE, account=DEFAULT_ACCOUNT):
+    """
+    Stream a CSV or OFX/QFX statement into the database.
+    Rows are inserted in chunks with executemany inside a single transaction,
+    so memory stays flat and the whole import commits once.
+
+    Args:
+        path (str): Path to a .csv, .ofx or .qfx file.
+        progress_callback (callable, optional): Called after each chunk as
+            progress_callback(rows_imported, fraction_done).
+        chunk_size (int): Number of rows per executemany batch.
+        account (str, optional): Account the statement belongs to; created if it is new.
+
+    Returns:
+        tuple: (rows_imported, rows_skipped)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        reader = read_csv_transactions
+    elif extension in ('.ofx', '.qfx'):
+        reader = read_ofx_transactions
+    else:
+        raise ValueError(f"Unsupported file type: {extension or path}")
+
+    total_size = max(os.path.getsize(path), 1)
+    state = {'read': 0, 'skipped': 0}
+    rows = reader(path, state)
+    imported = 0
+    with get_connection():  # One transaction for the whole file
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            insert_transactions(chunk, account)
+            imported += len(chunk)
+            if progress_callback:
+                progress_callback(imported, min(state['read'] / total_size, 1.0))
+    return imported, state['skipped']
@@ -0,0 +1,92 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LedgerService:
+    """
+    Runs database, aggregation and report work off the Tk main loop.
+
+    Jobs are executed on a single worker thread, so MoneyManager and its cache are
+    only ever touched by one thread and writes keep their order. Finished jobs are
+    queued and delivered to their callbacks on the Tk thread by a short after() poll.
+
+    Jobs submitted with a 'key' supersede earlier jobs with the same key: a pending
+    one is cancelled and a result that finishes late is dropped, so e.g. fast
+    scrolling only renders the last requested page.
+    """
+
+    POLL_INTERVAL_MS = 16  # ~60 fps
+
+    def __init__(self, root, max_workers=1):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ledger")
+        self._results = queue.SimpleQueue()  # Callbacks waiting to run on the Tk thread
+        self._generations = {}  # key -> number of the most recent job with that key
+        self._pending = {}  # key -> future of the most recent job with that key
+        self._closed = False
+        self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the worker thread.
+
+        Args:
+            fn (callable): The work to run.
+            on_done (callable, optional): Called on the Tk thread with the result.
+            on_error (callable, optional): Called on the Tk thread with the exception.
+                Without it, errors are printed.
+            key (str, optional): Jobs with the same key supersede each other.
+
+        Returns:
+            concurrent.futures.Future: The future for the job.
+        """
+        generation = None
+        if key is not None:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            previous = self._pending.get(key)
+            if previous is not None:
+                previous.cancel()  # Only succeeds if it hasn't started yet
+
+        future = self._executor.submit(fn, *args, **kwargs)
+        if key is not None:
+            self._pending[key] = future
+
+        def deliver(done):
+            if done.cancelled() or self._is_stale(key, generation):
+                return
+            error = done.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+                else:
+                    print(f"Background task failed: {error!r}")
+            elif on_done:
+                on_done(done.result())
+
+        future.add_done_callback(lambda done: self._results.put(lambda: deliver(done)))
+        return future
+
+    def post(self, callback, *args):
+        """Schedule callback(*args) on the Tk thread. Safe to call from worker threads."""
+        self._results.put(lambda: callback(*args))
+
+    def _is_stale(self, key, generation):
+        return key is not None and self._generations.get(key) != generation
+
+    def _poll(self):
+        # Deliver finished jobs on the Tk thread
+        while True:
+            try:
+                callback = self._results.get_nowait()
+            except queue.Empty:
+                break
+            callback()
+        if not self._closed:
+            self._poll_id = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def shutdown(self):
+        """Stop polling, drop queued jobs and wait for the running one to finish."""
+        self._closed = True
+        self.root.after_cancel(self._poll_id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
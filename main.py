@@ -1,12 +1,15 @@
 from gui_app import MoneyManagerApp
-from database import initialize_db
+from database import initialize_db, close_connection
 
 def main():
     # Initialize the database (create tables if they don't exist)
     initialize_db()  
     # Start the GUI
     app = MoneyManagerApp()  
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        close_connection()  # Commit and close the pooled SQLite connection
 
 if __name__ == "__main__":
-    main()  
\ No newline at end of file
+    main()  
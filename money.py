@@ -0,0 +1,49 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Money is handled as integer cents everywhere (database, MoneyManager, analytics);
+# these helpers convert at the edges, when reading user input and when displaying.
+
+
+def to_cents(value):
+    """
+    Convert a dollar amount to integer cents, rounding half up to the nearest cent.
+
+    Args:
+        value (str, int, float or Decimal): Strings may look like '$1,234.56',
+            '-12.00' or '(12.00)' (accounting style negative).
+
+    Returns:
+        int: The amount in cents.
+
+    Raises:
+        ValueError: If the value isn't a finite number.
+    """
+    if isinstance(value, str):
+        value = value.strip().replace('$', '').replace(',', '')
+        if value.startswith('(') and value.endswith(')'):
+            value = '-' + value[1:-1]
+    elif isinstance(value, float):
+        value = repr(value)  # Shortest decimal form, e.g. 0.1 -> '0.1' rather than its binary expansion
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents, symbol=True, grouping=True):
+    """
+    Format integer cents as dollars, e.g. 123456 -> '$1,234.56' and -5 -> '-$0.05'.
+    With symbol=False the dollar sign is left out ('1,234.56'), e.g. for input fields;
+    with grouping=False also the thousands separators ('1234.56'), e.g. for CSV files.
+    """
+    sign = '-' if cents < 0 else ''
+    dollars, cents = divmod(abs(int(cents)), 100)
+    return f"{sign}{'$' if symbol else ''}{dollars:{',' if grouping else ''}}.{cents:02d}"
+
+
+def cents_to_dollars(cents):
+    """Integer cents (or an array of them) as float dollars, for charts."""
+    return cents / 100
@@ -1,44 +1,440 @@
-from tkinter import *
-from collections import defaultdict
-from datetime import datetime
+import functools
+from collections import deque
+from datetime import date
 from database import (
     insert_transaction, fetch_transactions, delete_transaction_by_id,
-    update_transaction_by_id
+    update_transaction_by_id, fetch_transactions_page, count_transactions,
+    fetch_transaction_by_id, fetch_transactions_by_ids, fetch_data_version,
+    fetch_categories, restore_transactions, delete_transactions_by_ids,
+    fetch_transaction_ids_by_category, update_category_by_ids, savepoint,
+    fetch_accounts, insert_account, shard_transactions, fetch_shards, insert_recurring_rule,
+    fetch_recurring_rules, delete_recurring_rule, post_recurring_rule, set_budget, fetch_budgets,
+    fetch_change_seq, fetch_changes, DEFAULT_ACCOUNT
 )
+from forecast import Forecast, FORECAST_MONTHS, FREQUENCIES, next_occurrence, occurrences, signed_amount
+from profiling import instrumented
+from shards import total_balance, account_balances, expense_by_category, monthly_expenses
+
+UNDO_LIMIT = 100  # Journal entries kept for undo
+BUDGET_WARNING = 0.9  # Share of a monthly budget that triggers an alert
+CHANGE_BATCH_LIMIT = 1000  # Other processes' changes applied row by row; more than this reloads the cache
+
+
+def month_key(date_str):
+    # 'YYYY-MM-DD' -> 'MM-YYYY', the key used by the monthly report
+    return f"{date_str[5:7]}-{date_str[:4]}"
+
+
+def inverse_step(step):
+    """
+    The journal step that undoes 'step'. Steps are tuples:
+    ('insert', rows), ('delete', rows), ('update', old_row, new_row) and
+    ('recategorize', ids, old_category, new_category).
+    """
+    kind = step[0]
+    if kind == 'insert':
+        return ('delete', step[1])
+    if kind == 'delete':
+        return ('insert', step[1])
+    if kind == 'update':
+        return ('update', step[2], step[1])
+    return ('recategorize', step[1], step[3], step[2])
+
+
+def writes_ledger(method):
+    """
+    Marks a MoneyManager method that writes to the database. Other processes' changes
+    are applied before it runs and not while it runs; its own change_log entries are
+    skipped afterwards, since the method already updated the cache.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._sync_cache()
+        self._writing = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._writing = False
+            self._skip_own_changes()
+    return wrapper
+
 
 class MoneyManager:
+    """
+    Application logic on top of database.py.
+
+    Amounts are integer cents throughout (see money.py for converting user input).
+
+    Keeps a write-through cache of the ledger and its aggregates (balance, per-account
+    balances, per-category and per-month expense totals, row count, category and account
+    names). Each part is loaded lazily and updated with O(1) deltas by add/edit/delete.
+    When 'PRAGMA data_version' shows another process committed, its entries in the
+    database's change_log are applied the same way (see poll_changes()); the cache is
+    only dropped after bulk changes.
+    Aggregates cover rows moved to shard files as well (see shard()); the transaction
+    log, lookups and edits work on the live ledger.
+
+    Recurring rules feed a Forecast of month-end balances and budgets are checked
+    against cached spending for the current month; both are updated by the same
+    deltas, so neither is recomputed from the ledger after a write.
+
+    Every add, edit and delete is also recorded in an undo journal as the steps
+    that changed the ledger; undo() applies their inverses and redo() replays them,
+    each in one savepoint. Bulk actions (delete_transactions, recategorize) are a
+    single journal entry and a single transaction.
+    """
+
+    def __init__(self, root=None):
+        self.root = root  # Optional Tk root; MoneyManager itself never touches the GUI
+        self._data_version = None
+        self._undo = deque(maxlen=UNDO_LIMIT)  # (label, steps), most recent last
+        self._redo = []
+        self._change_seq = None  # Last change_log entry reflected in the cache
+        self._external_changes = None  # Other processes' changes not yet returned by poll_changes()
+        self._writing = False  # Inside a writes_ledger method
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._ledger = None  # Transaction ID -> transaction dict
+        self._ordered = None  # Ledger sorted newest first, rebuilt after writes
+        self._count = None
+        self._balance = None
+        self._account_balances = None  # Account name -> balance
+        self._category_totals = None
+        self._monthly_totals = None  # 'MM-YYYY' -> total expenses
+        self._filtered_counts = {}  # Search filters -> match count, dropped on every write
+        self._categories = None  # Set of known category names, for autocomplete
+        self._accounts = None  # Set of account names
+        self._rules = None  # Rule ID -> recurring rule
+        self._forecast = None  # Forecast over the cached rules
+        self._budgets = None  # Category -> monthly limit
+        self._month_spending = None  # Category -> expenses in self._spending_month
+        self._spending_month = None  # 'YYYY-MM'
+
+    def _sync_cache(self):
+        """
+        Catch up with changes other processes committed since the last call.
+        Costs one PRAGMA when there are none; otherwise the new change_log entries are
+        read and applied to the cache, which is only dropped if there are too many,
+        entries were pruned, or a bulk change asked readers to reload.
+        """
+        if self._writing:
+            return  # Sorted out by _skip_own_changes() once the write is done
+        version = fetch_data_version()
+        if version == self._data_version:
+            return
+        self._data_version = version
+        if self._change_seq is None:
+            self._change_seq = fetch_change_seq()  # Nothing cached relies on earlier entries
+            return
+        # Entries and current rows come from one snapshot, so they agree with each other
+        changes, rows, last_seq = fetch_changes(self._change_seq, CHANGE_BATCH_LIMIT + 1)
+        if not changes:
+            return
+        # Inverse steps may no longer match rows another process changed
+        self._undo.clear()
+        self._redo.clear()
+        if self._external_changes is None:
+            self._external_changes = {
+                'reload': False, 'inserted': set(), 'updated': set(), 'deleted': set(), 'kinds': set()
+            }
+        report = self._external_changes
+        report['kinds'].update(change['kind'] for change in changes)
+        if (len(changes) > CHANGE_BATCH_LIMIT or changes[0]['seq'] != self._change_seq + 1
+                or any(change['kind'] == 'reload' for change in changes)):
+            self._reset_cache()
+            self._change_seq = last_seq
+            report['reload'] = True
+            return
+        self._change_seq = changes[-1]['seq']
+        self._apply_changes(changes, rows, report)
+
+    def _apply_changes(self, changes, current, report):
+        # Apply change_log entries: every changed transaction comes out of the cache as it
+        # was before its first change and goes back in as it was in the same snapshot ('current')
+        first_old = {}  # Transaction ID -> row before its first change (None if it was inserted)
+        for change in changes:
+            if change['kind'] == 'transaction':
+                first_old.setdefault(change['row_id'], change['old'])
+            elif change['kind'] == 'rule':
+                self._rules = None
+                self._forecast = None
+            elif change['kind'] == 'budget':
+                self._budgets = None
+            elif change['kind'] == 'account':
+                self._accounts = None
+                self._account_balances = None
+        for trans_id, old in first_old.items():
+            new = current.get(trans_id)
+            if old is not None:
+                self._cache_remove(old)
+            if new is not None:
+                self._cache_insert(new)
+            if old is None and new is not None:
+                report['inserted'].add(trans_id)
+            elif old is not None:
+                report['updated' if new is not None else 'deleted'].add(trans_id)
+
+    def _skip_own_changes(self):
+        # Move past the change_log entries of our own write; if another process committed
+        # in between, its entries can't be told apart from ours, so the cache is reloaded
+        seq = fetch_change_seq()
+        version = fetch_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._reset_cache()
+            self._undo.clear()
+            self._redo.clear()
+        self._change_seq = seq
+
+    def _load(self, load, *args):
+        # Read an aggregate the cache doesn't hold yet. If another process committed since the
+        # last sync, the value may already include changes the next sync would apply to it again,
+        # so the cache catches up first and the value is read again
+        while True:
+            value = load(*args)
+            if self._writing or fetch_data_version() == self._data_version:
+                return value
+            self._sync_cache()
+
+    @instrumented
+    def poll_changes(self):
+        """
+        Pick up changes committed by other processes (another window, an import script).
+        Cheap enough to call every second: one PRAGMA when nothing changed.
 
-    def __init__(self, root):
-        self.root = root
+        Returns:
+            dict: None if nothing changed since the last poll, otherwise 'inserted',
+            'updated' and 'deleted' (sets of transaction IDs), 'kinds' (the change_log
+            kinds seen, e.g. 'rule') and 'reload' (True if the cache was dropped instead).
+        """
+        self._sync_cache()
+        changes, self._external_changes = self._external_changes, None
+        return changes
+
+    def _apply_delta(self, t, sign):
+        """
+        Add (sign=1) or remove (sign=-1) one transaction from the cached aggregates.
+        Aggregates that have not been loaded yet are left alone.
+        """
+        amount = t['amount_cents'] * sign
+        self._filtered_counts = {}
+        if self._categories is not None and sign > 0:
+            self._categories.add(t['category'])
+        if self._accounts is not None and sign > 0:
+            self._accounts.add(t['account'])
+        if self._count is not None:
+            self._count += sign
+        signed = signed_amount(t) * sign
+        if self._balance is not None:
+            self._balance += signed
+        if self._forecast is not None:
+            self._forecast.add_to_balance(signed)
+        if self._account_balances is not None:
+            self._account_balances[t['account']] = self._account_balances.get(t['account'], 0) + signed
+        if t['type'] != 'expense':
+            return
+        if self._category_totals is not None:
+            self._category_totals[t['category']] = self._category_totals.get(t['category'], 0) + amount
+            if sign < 0 and self._category_totals[t['category']] == 0:
+                del self._category_totals[t['category']]
+        if self._month_spending is not None and t['date'][:7] == self._spending_month:
+            self._month_spending[t['category']] = self._month_spending.get(t['category'], 0) + amount
+        if self._monthly_totals is not None:
+            key = month_key(t['date'])
+            self._monthly_totals[key] = self._monthly_totals.get(key, 0) + amount
+            if sign < 0 and self._monthly_totals[key] == 0:
+                del self._monthly_totals[key]
+
+    def _cache_insert(self, t):
+        if self._ledger is not None:
+            self._ledger[t['id']] = t
+            self._ordered = None
+        self._apply_delta(t, 1)
+
+    def _cache_remove(self, t):
+        if self._ledger is not None:
+            self._ledger.pop(t['id'], None)
+            self._ordered = None
+        self._apply_delta(t, -1)
+
+    def _cached_transaction(self, trans_id):
+        # Look a transaction up in the ledger cache, falling back to a primary-key query
+        if self._ledger is not None:
+            return self._ledger.get(trans_id)
+        return fetch_transaction_by_id(trans_id)
+
+    def _record(self, label, steps):
+        # Journal a user action; a new action makes the redo history meaningless
+        self._undo.append((label, steps))
+        self._redo.clear()
+
+    def _run_step(self, step):
+        # Apply one journal step to the database and the cache
+        kind = step[0]
+        if kind == 'insert':
+            restore_transactions(step[1])
+            for row in step[1]:
+                self._cache_insert(dict(row))
+        elif kind == 'delete':
+            delete_transactions_by_ids([row['id'] for row in step[1]])
+            for row in step[1]:
+                self._cache_remove(row)
+        elif kind == 'update':
+            old, new = step[1], step[2]
+            update_transaction_by_id(new['id'], new['name'], new['amount_cents'], new['category'])
+            self._cache_remove(old)
+            self._cache_insert(dict(new))
+        else:
+            update_category_by_ids(step[1], step[3])
+            self._reset_cache()  # Touches many rows; reloading beats per-row deltas
+
+    def _run_steps(self, steps):
+        # Apply steps in one savepoint; if any fails the database is unchanged and the cache is dropped
+        try:
+            with savepoint():
+                for step in steps:
+                    self._run_step(step)
+        except Exception:
+            self._reset_cache()
+            raise
+
+    @instrumented
+    @writes_ledger
+    def add_income(self, amount_cents, name, category, account=DEFAULT_ACCOUNT):
+        # Add an income transaction (amount in cents) to the database
+        row = insert_transaction('income', amount_cents, name, category, account)
+        self._cache_insert(row)
+        self._record(f"add '{name}'", [('insert', [dict(row)])])
 
-    def add_income(self, amount, name, category):
-        # Add an income transaction to the database
-        insert_transaction('income', amount, name, category)
+    @instrumented
+    @writes_ledger
+    def add_expense(self, amount_cents, name, category, account=DEFAULT_ACCOUNT):
+        # Add an expense transaction (amount in cents) to the database; returns the budget alerts of its category
+        row = insert_transaction('expense', amount_cents, name, category, account)
+        self._cache_insert(row)
+        self._record(f"add '{name}'", [('insert', [dict(row)])])
+        return self.budget_alerts([category])
 
-    def add_expense(self, amount, name, category):
-        # Add an expense transaction to the database
-        insert_transaction('expense', amount, name, category)
+    @instrumented
+    @writes_ledger
+    def import_file(self, path, progress_callback=None, account=DEFAULT_ACCOUNT):
+        """
+        Bulk import a CSV/OFX statement into an account (see importer.import_transactions).
+        The cache is reloaded afterwards rather than updated row by row.
+        """
+        from importer import import_transactions  # Loaded on first import only
+
+        try:
+            return import_transactions(path, progress_callback, account=account)
+        finally:
+            self._reset_cache()
+
+    @instrumented
+    @writes_ledger
+    def add_account(self, name):
+        # Create an account; returns False if it already exists
+        added = insert_account(name)
+        if self._accounts is not None:
+            self._accounts.add(name)
+        if added and self._account_balances is not None:
+            self._account_balances[name] = 0
+        return added
+
+    @instrumented
+    def get_accounts(self):
+        # All account names, sorted
+        self._sync_cache()
+        if self._accounts is None:
+            self._accounts = set(self._load(fetch_accounts))
+        return sorted(self._accounts)
+
+    @instrumented
+    def get_account_balances(self):
+        # Balance of every account in cents, including rows moved to shards
+        self._sync_cache()
+        if self._account_balances is None:
+            self._account_balances = self._load(account_balances)
+        return dict(sorted(self._account_balances.items()))
 
+    @instrumented
+    @writes_ledger
+    def shard(self, year=None, account=None):
+        """
+        Move a year and/or an account out of the live ledger into a shard file
+        (see database.shard_transactions). Balances and reports still include the rows.
+        The journal is cleared, since its steps may refer to rows that moved.
+        """
+        try:
+            return shard_transactions(year, account)
+        finally:
+            self._reset_cache()
+            self._undo.clear()
+            self._redo.clear()
+
+    def get_shards(self):
+        # The shard files of the ledger, see database.fetch_shards
+        return fetch_shards()
+
+    @instrumented
     def get_transactions(self):
-        # Retrieve all transactions from the database
-        return fetch_transactions()
+        # Retrieve all transactions (newest first) from the ledger cache
+        self._sync_cache()
+        if self._ledger is None:
+            self._ordered = self._load(fetch_transactions)
+            self._ledger = {t['id']: t for t in self._ordered}
+        if self._ordered is None:
+            self._ordered = sorted(self._ledger.values(), key=lambda t: (t['date'], t['id']), reverse=True)
+        return list(self._ordered)
 
-    def get_balance(self):
-        # Calculate current balance by summing income and subtracting expenses
-        transactions = self.get_transactions()
-        income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-        expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
-        return income - expenses
+    @instrumented
+    def get_transaction(self, trans_id):
+        # Look up a single transaction by ID (cache first, then a primary-key query)
+        self._sync_cache()
+        return self._cached_transaction(trans_id)
 
-    def refresh_transaction_log(self):
-        """Refresh the transaction log list widget from the database."""
-        transactions = self.get_transactions()  # Fetch transactions directly from DB
-        self.transaction_log.delete(0, END)  # Clear previous entries
+    @instrumented
+    def get_transactions_by_ids(self, trans_ids):
+        # Look up several transactions by ID; returns a dict of ID -> transaction
+        self._sync_cache()
+        if self._ledger is not None:
+            return {i: self._ledger[i] for i in trans_ids if i in self._ledger}
+        return fetch_transactions_by_ids(trans_ids)
 
-        # Loop through each transaction and display in list format
-        for t in transactions:
-            self.transaction_log.insert(END, f"{t['date']} | {t['type']} | {t['amount']} | {t['name']}")
+    @instrumented
+    def get_transactions_page(self, limit, offset=0, after=None, filters=None):
+        # Retrieve one page of transactions (newest first), optionally after a (date, id) cursor
+        # and restricted to the search filters (see database._filter_clause)
+        return fetch_transactions_page(limit, offset, after, filters)
 
+    @instrumented
+    def count_transactions(self, filters=None):
+        # Number of transactions in the ledger, or matching the search filters
+        self._sync_cache()
+        if filters:
+            key = tuple(sorted(filters.items()))
+            if key not in self._filtered_counts:
+                self._filtered_counts[key] = self._load(count_transactions, filters)
+            return self._filtered_counts[key]
+        if self._count is None:
+            self._count = self._load(count_transactions)
+        return self._count
+
+    @instrumented
+    def get_balance(self):
+        # Current balance in cents (income minus expenses), summed in SQL once and then kept up to date
+        self._sync_cache()
+        if self._balance is None:
+            self._balance = self._load(total_balance)
+        return self._balance
+
+    @instrumented
+    def get_categories(self):
+        # All category names, sorted; served from an in-memory set after the first call
+        self._sync_cache()
+        if self._categories is None:
+            self._categories = set(self._load(fetch_categories))
+        return sorted(self._categories)
 
     # def view_transactions(self):
     #     """
@@ -55,50 +451,291 @@ class MoneyManager:
     #               f"{t['type'].capitalize():7} | "
     #               f"{t['name']:15} | "
     #               f"{t['category']:10} | "
-    #               f"${t['amount']:.2f}")
+    #               f"{format_cents(t['amount_cents'])}")
 
-    def edit_transaction(self, trans_id, new_name=None, new_amount=None, new_category=None):
+    @instrumented
+    @writes_ledger
+    def edit_transaction(self, trans_id, new_name=None, new_amount_cents=None, new_category=None):
         """
         Edit an existing transaction by ID.
         Only provided fields (name, amount, category) will be updated.
         """
-        return update_transaction_by_id(trans_id, new_name, new_amount, new_category)
+        old = self._cached_transaction(trans_id)
+        updated = update_transaction_by_id(trans_id, new_name, new_amount_cents, new_category)
+        if updated and old is not None:
+            new = dict(old)
+            if new_name:
+                new['name'] = new_name
+            if new_amount_cents:
+                new['amount_cents'] = int(new_amount_cents)
+            if new_category:
+                new['category'] = new_category
+            self._cache_remove(old)
+            self._cache_insert(new)
+            self._record(f"edit '{old['name']}'", [('update', dict(old), dict(new))])
+        elif updated:
+            self._reset_cache()
+        return updated
 
+    @instrumented
+    @writes_ledger
     def delete_transaction(self, trans_id):
         """
         Delete a transaction by its ID.
         """
-        return delete_transaction_by_id(trans_id)
+        old = self._cached_transaction(trans_id)
+        deleted = delete_transaction_by_id(trans_id)
+        if deleted and old is not None:
+            self._cache_remove(old)
+            self._record(f"delete '{old['name']}'", [('delete', [dict(old)])])
+        elif deleted:
+            self._reset_cache()
+        return deleted
+
+    @instrumented
+    @writes_ledger
+    def delete_transactions(self, trans_ids):
+        """
+        Delete several transactions in one transaction, as a single undoable action.
+        Returns the number of rows deleted.
+        """
+        rows = list(self.get_transactions_by_ids(trans_ids).values())
+        if not rows:
+            return 0
+        rows = [dict(row) for row in rows]
+        self._run_steps([('delete', rows)])
+        self._record(f"delete {len(rows)} transactions", [('delete', rows)])
+        return len(rows)
+
+    @instrumented
+    @writes_ledger
+    def recategorize(self, old_category, new_category):
+        """
+        Move every transaction in old_category to new_category in one transaction,
+        as a single undoable action. Returns the number of rows moved.
+        """
+        if old_category == new_category:
+            return 0
+        ids = fetch_transaction_ids_by_category(old_category)
+        if not ids:
+            return 0
+        step = ('recategorize', ids, old_category, new_category)
+        self._run_steps([step])
+        self._record(f"move '{old_category}' to '{new_category}'", [step])
+        return len(ids)
+
+    @instrumented
+    @writes_ledger
+    def undo(self):
+        """
+        Undo the most recent action by applying the inverse of its steps in reverse order.
+        Returns the action's label, or None if there is nothing to undo.
+        """
+        if not self._undo:
+            return None
+        label, steps = self._undo[-1]
+        self._run_steps([inverse_step(step) for step in reversed(steps)])
+        self._undo.pop()
+        self._redo.append((label, steps))
+        return label
+
+    @instrumented
+    @writes_ledger
+    def redo(self):
+        """
+        Redo the most recently undone action. Returns its label, or None if there is nothing to redo.
+        """
+        if not self._redo:
+            return None
+        label, steps = self._redo[-1]
+        self._run_steps(steps)
+        self._redo.pop()
+        self._undo.append((label, steps))
+        return label
+
+    def history(self):
+        # Labels of the next undo and redo actions (None when there is none), for the GUI
+        return (
+            self._undo[-1][0] if self._undo else None,
+            self._redo[-1][0] if self._redo else None,
+        )
+
+    def _cached_rules(self):
+        if self._rules is None:
+            self._rules = {rule['id']: rule for rule in self._load(fetch_recurring_rules)}
+        return self._rules
+
+    @instrumented
+    def get_recurring(self):
+        # All recurring rules, next due first
+        self._sync_cache()
+        return sorted(self._cached_rules().values(), key=lambda rule: (rule['next_date'], rule['id']))
+
+    @instrumented
+    @writes_ledger
+    def add_recurring(self, trans_type, amount_cents, name, category, frequency, start_date=None,
+                      end_date=None, account=DEFAULT_ACCOUNT):
+        """
+        Add a recurring rule (see database.insert_recurring_rule); the first occurrence
+        is due on start_date, today by default. The forecast is updated from the first
+        month the rule affects. Occurrences are posted by post_recurring().
+
+        Returns:
+            dict: The new rule.
+        """
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency: {frequency}")
+        for day in (start_date, end_date):
+            if day:
+                date.fromisoformat(day)  # Raises ValueError unless it is YYYY-MM-DD
+        rule = insert_recurring_rule(
+            trans_type, amount_cents, name, category, frequency,
+            start_date or date.today().isoformat(), end_date, account
+        )
+        if self._rules is not None:
+            self._rules[rule['id']] = rule
+        if self._forecast is not None:
+            self._forecast.set_rule(rule)
+        return rule
 
+    @instrumented
+    @writes_ledger
+    def delete_recurring(self, rule_id):
+        # Delete a recurring rule; returns False if there was none
+        deleted = delete_recurring_rule(rule_id)
+        if self._rules is not None:
+            self._rules.pop(rule_id, None)
+        if self._forecast is not None:
+            self._forecast.remove_rule(rule_id)
+        return deleted
+
+    @instrumented
+    @writes_ledger
+    def post_recurring(self, today=None):
+        """
+        Post every occurrence of the recurring rules that is due by today as a transaction.
+        Safe to call repeatedly (e.g. at startup): each rule remembers the next date to post.
+
+        Returns:
+            int: The number of transactions posted.
+        """
+        today = today or date.today()
+        posted = 0
+        try:
+            for rule in list(self._cached_rules().values()):
+                dates = occurrences(rule, date.min, today)
+                if not dates:
+                    continue
+                next_date = next_occurrence(rule, dates[-1]).isoformat()
+                posted += post_recurring_rule(rule, [day.isoformat() for day in dates], next_date)
+                rule['next_date'] = next_date
+        finally:
+            if posted:
+                self._reset_cache()  # Reloaded like after an import
+        return posted
+
+    @instrumented
+    def get_forecast(self, months=FORECAST_MONTHS):
+        """
+        Projected balance at the end of this month and the following ones, from the
+        current balance and the recurring rules not posted yet.
+        The projection is built once (and again when the day changes) and then updated
+        incrementally by new transactions and rule changes.
+
+        Returns:
+            dict: 'labels' ('MM-YYYY') and 'balance' (cents), one entry per month.
+        """
+        self._sync_cache()
+        forecast = self._forecast
+        if forecast is None or forecast.months != months or forecast.today != date.today():
+            rules = self._cached_rules().values()
+            self._forecast = forecast = Forecast(self.get_balance(), rules, months)
+        return forecast.series()
+
+    @instrumented
+    @writes_ledger
+    def set_budget(self, category, limit_cents):
+        # Set a category's monthly spending limit in cents; None removes it
+        set_budget(category, limit_cents)
+        if self._budgets is not None:
+            if limit_cents is None:
+                self._budgets.pop(category, None)
+            else:
+                self._budgets[category] = limit_cents
+
+    @instrumented
+    def get_budgets(self):
+        # Category -> monthly spending limit in cents
+        self._sync_cache()
+        if self._budgets is None:
+            self._budgets = self._load(fetch_budgets)
+        return dict(self._budgets)
+
+    def _current_spending(self):
+        # Expenses per category this month, loaded from the rollup once per month
+        month = date.today().strftime("%Y-%m")
+        if self._month_spending is None or self._spending_month != month:
+            self._month_spending = self._load(expense_by_category, month)
+            self._spending_month = month
+        return self._month_spending
+
+    @instrumented
+    def budget_status(self, categories=None):
+        """
+        Spending this month against the limit of every budgeted category.
+        Spending and limits are cached and kept current by every write, so this costs
+        O(categories), and checking a single category is O(1).
+
+        Args:
+            categories (iterable, optional): Only these categories.
+
+        Returns:
+            list: Dicts with 'category', 'spent_cents' and 'limit_cents', by category name.
+        """
+        self._sync_cache()
+        if self._budgets is None:
+            self._budgets = self._load(fetch_budgets)
+        budgets = self._budgets
+        spending = self._current_spending()
+        selected = budgets if categories is None else set(categories) & budgets.keys()
+        return [
+            {'category': category, 'spent_cents': spending.get(category, 0), 'limit_cents': budgets[category]}
+            for category in sorted(selected)
+        ]
+
+    def budget_alerts(self, categories=None):
+        # Budgets (see budget_status) of which at least BUDGET_WARNING has been spent this month
+        return [
+            status for status in self.budget_status(categories)
+            if status['spent_cents'] >= status['limit_cents'] * BUDGET_WARNING
+        ]
+
+    @instrumented
     def get_expense_by_category(self):
         """
-        Calculate the total expenses per category.
-        Only expense transactions are considered.
+        Calculate the total expenses per category, in cents.
+        Only expense transactions are considered; the sums are done by SQLite
+        on first use and then kept current by the write-through cache.
         """
-        transactions = self.get_transactions()
-        category_totals = defaultdict(float)
-        for t in transactions:
-            if t['type'] == 'expense':
-                category_totals[t['category']] += t['amount']
-        return dict(category_totals)
+        self._sync_cache()
+        if self._category_totals is None:
+            self._category_totals = self._load(expense_by_category)
+        return dict(self._category_totals)
 
+    @instrumented
     def get_monthly_expenses(self):
         """
-        Combine expenses on a per-month basis.
-        Assumes date format is 'Month DD, YYYY'
-        """
-        transactions = self.get_transactions()
-        monthly_expenses = defaultdict(float)
-
-        for t in transactions:
-            if t['type'] == 'expense':
-                date_str = t.get('date')
-                try:
-                    # Parse the human-readable date format
-                    date_obj = datetime.strptime(date_str, "%B %d, %Y")
-                    # Create a key like '05-2025' for monthly grouping
-                    month_key = date_obj.strftime("%m-%Y")
-                    monthly_expenses[month_key] += t['amount']
-                except Exception as e:
-                    print(f"Skipping invalid date: {date_str} - {e}")
-        return dict(sorted(monthly_expenses.items()))
+        Combine expenses on a per-month basis, in cents.
+        Returns a dict keyed by 'MM-YYYY' in chronological order.
+        """
+        self._sync_cache()
+        if self._monthly_totals is None:
+            self._monthly_totals = self._load(monthly_expenses)
+        return dict(sorted(self._monthly_totals.items(), key=lambda item: (item[0][3:], item[0][:2])))
+
+
+if __name__ == "__main__":
+    # 'python -m money_manager ...' runs the headless command line (see cli.py)
+    import sys
+    from cli import main
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+RING_BUFFER_SIZE = 5000  # Most recent timed calls kept in memory
+PROFILE_ENV_VAR = "MONEY_MANAGER_PROFILE"  # Set to 1 to enable timing at startup
+
+_enabled = os.environ.get(PROFILE_ENV_VAR) == "1"
+_records = deque(maxlen=RING_BUFFER_SIZE)
+_thread_state = threading.local()  # Per-thread SQL statement counter
+_profiler = None
+
+
+def instrumented(fn):
+    """
+    Decorator that records wall time, CPU time, SQL statements and rows returned
+    for every call of 'fn' while profiling is enabled. When disabled the only cost
+    is one flag check per call.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        record = {
+            'name': name,
+            'time': time.time(),
+            'thread': threading.current_thread().name,
+            'rows': None,
+        }
+        queries_before = getattr(_thread_state, 'queries', 0)
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            return_value = fn(*args, **kwargs)
+            if isinstance(return_value, (list, dict)):
+                record['rows'] = len(return_value)
+            return return_value
+        finally:
+            record['wall_ms'] = (time.perf_counter() - wall_start) * 1000
+            record['cpu_ms'] = (time.thread_time() - cpu_start) * 1000
+            record['queries'] = getattr(_thread_state, 'queries', 0) - queries_before
+            _records.append(record)
+
+    return wrapper
+
+
+def count_query(statement):
+    # SQLite trace callback: counts every statement executed on this thread
+    _thread_state.queries = getattr(_thread_state, 'queries', 0) + 1
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    """Start recording timings and counting SQL statements."""
+    global _enabled
+    from database import set_query_tracer  # Imported here to avoid a circular import
+    set_query_tracer(count_query)
+    _enabled = True
+
+
+def disable():
+    """Stop recording; the recorded data is kept until clear()."""
+    global _enabled
+    from database import set_query_tracer
+    set_query_tracer(None)
+    _enabled = False
+
+
+def clear():
+    _records.clear()
+
+
+def records():
+    """Snapshot of the recorded calls, oldest first."""
+    return list(_records)
+
+
+def summary():
+    """
+    Aggregate the recorded calls per function.
+
+    Returns:
+        list: One dict per function with 'name', 'calls', 'wall_ms', 'cpu_ms',
+        'mean_ms', 'max_ms', 'queries' and 'rows', slowest total first.
+    """
+    totals = {}
+    for record in records():
+        entry = totals.setdefault(record['name'], {
+            'name': record['name'], 'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0,
+            'max_ms': 0.0, 'queries': 0, 'rows': 0,
+        })
+        entry['calls'] += 1
+        entry['wall_ms'] += record['wall_ms']
+        entry['cpu_ms'] += record['cpu_ms']
+        entry['max_ms'] = max(entry['max_ms'], record['wall_ms'])
+        entry['queries'] += record['queries']
+        entry['rows'] += record['rows'] or 0
+    for entry in totals.values():
+        entry['mean_ms'] = entry['wall_ms'] / entry['calls']
+    return sorted(totals.values(), key=lambda e: e['wall_ms'], reverse=True)
+
+
+def format_summary():
+    """Summary as an aligned text table for the diagnostics window."""
+    lines = ["{:<58} {:>6} {:>10} {:>9} {:>9} {:>9} {:>8} {:>9}".format(
+        "Function", "Calls", "Total ms", "Mean ms", "Max ms", "CPU ms", "Queries", "Rows"
+    )]
+    for e in summary():
+        lines.append("{:<58} {:>6} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.1f} {:>8} {:>9}".format(
+            e['name'][-58:], e['calls'], e['wall_ms'], e['mean_ms'], e['max_ms'], e['cpu_ms'], e['queries'], e['rows']
+        ))
+    return "\n".join(lines)
+
+
+def export_json(path):
+    """Write the raw records and the per-function summary to a JSON file."""
+    with open(path, "w") as f:
+        json.dump({'summary': summary(), 'records': records()}, f, indent=2)
+
+
+def start_cprofile():
+    """Start a cProfile session (main thread) for a full call-graph dump."""
+    global _profiler
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop_cprofile(path):
+    """Stop the cProfile session and write it to 'path' (readable with pstats or snakeviz)."""
+    global _profiler
+    if _profiler is None:
+        return False
+    _profiler.disable()
+    _profiler.dump_stats(path)
+    _profiler = None
+    return True
+
+
+def cprofile_running():
+    return _profiler is not None
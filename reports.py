@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import MaxNLocator
+import analytics
+from database import fetch_ledger_version
+from exporter import load_snapshot
+from money import cents_to_dollars
+from profiling import instrumented
+
+TREND_WINDOW = 3  # Months in the rolling average of the net trend
+MAX_MONTH_TICKS = 12  # Keep month labels readable on long ledgers
+REPORT_CACHE_SIZE = 4  # Reports (distinct parameter sets) kept by ReportCache
+
+
+@instrumented
+def compute_report_series(date_from=None, date_to=None, snapshot=None, forecast=None):
+    """
+    Load the ledger into columnar arrays and aggregate everything the report shows.
+    All aggregation is vectorized in analytics. Amounts stay in integer cents, so
+    comparing two series is exact; the drawing helpers convert them to dollars.
+    Rows moved to shard files are included. With 'snapshot' (the path of a file
+    written by exporter.export_snapshot) the columns are memory-mapped from it instead
+    of loaded from the database. 'forecast' (see MoneyManager.get_forecast) is passed
+    through as the projected-balance series.
+
+    Returns:
+        dict: 'categories' (category -> total expenses), 'monthly_labels',
+        'monthly_values', 'trend' (see analytics.income_expense_trend) and 'forecast'.
+    """
+    if snapshot:
+        columns = load_snapshot(snapshot, date_from, date_to)
+    else:
+        columns = analytics.load_all_columns(date_from, date_to)
+    monthly_labels, monthly_values = analytics.monthly_series(columns, 'expense')
+    return {
+        'categories': analytics.category_totals(columns, 'expense'),
+        'monthly_labels': monthly_labels,
+        'monthly_values': monthly_values,
+        'trend': analytics.income_expense_trend(columns, TREND_WINDOW),
+        'forecast': forecast or {'labels': [], 'balance': []},
+    }
+
+
+def _draw_categories(ax, category_data):
+    # --- Pie Chart: Expenses by Category ---
+    ax.clear()
+    ax.axis('on')
+    if category_data:
+        ax.pie(category_data.values(), labels=category_data.keys(), autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')  # Equal aspect ratio for a circular pie
+        ax.set_title('Expenses by Category')
+    else:
+        ax.text(0.5, 0.5, 'No expense data', ha='center', va='center')
+        ax.axis('off')  # Hide axes when there's no data
+
+
+def _draw_monthly(ax, monthly_labels, monthly_values):
+    # --- Bar Chart: Monthly Expenses ---
+    ax.clear()
+    ax.axis('on')
+    if len(monthly_labels):
+        ax.bar(monthly_labels, cents_to_dollars(monthly_values))
+        ax.set_title('Monthly Expenses')
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Amount')
+        ax.xaxis.set_major_locator(MaxNLocator(MAX_MONTH_TICKS, integer=True))
+        ax.tick_params(axis='x', labelrotation=45)
+    else:
+        ax.text(0.5, 0.5, 'No monthly data', ha='center', va='center')
+        ax.axis('off')
+
+
+def _draw_trend(ax, trend):
+    # --- Line Chart: Income vs Expenses ---
+    ax.clear()
+    ax.axis('on')
+    if len(trend['labels']):
+        ax.plot(trend['labels'], cents_to_dollars(trend['income']), label='Income')
+        ax.plot(trend['labels'], cents_to_dollars(trend['expense']), label='Expenses')
+        ax.plot(trend['labels'], cents_to_dollars(trend['net_average']), linestyle='--',
+                label=f'Net ({TREND_WINDOW}-month avg)')
+        ax.set_title('Income vs Expenses')
+        ax.set_ylabel('Amount')
+        ax.legend()
+        ax.xaxis.set_major_locator(MaxNLocator(MAX_MONTH_TICKS, integer=True))
+    else:
+        ax.text(0.5, 0.5, 'No trend data', ha='center', va='center')
+        ax.axis('off')
+
+
+def _draw_forecast(ax, forecast):
+    # --- Line Chart: Projected Balance ---
+    ax.clear()
+    ax.axis('on')
+    if forecast['labels']:
+        ax.plot(forecast['labels'], [cents_to_dollars(c) for c in forecast['balance']], marker='o', label='Projected balance')
+        ax.axhline(0, color='grey', linewidth=0.8, linestyle=':')
+        ax.set_title('Balance Forecast')
+        ax.set_ylabel('Amount')
+        ax.xaxis.set_major_locator(MaxNLocator(MAX_MONTH_TICKS, integer=True))
+    else:
+        ax.text(0.5, 0.5, 'No forecast', ha='center', va='center')
+        ax.axis('off')
+
+
+@instrumented
+def build_report_figure(series):
+    """
+    Build the financial report figure: expenses by category, monthly expenses and
+    the monthly income/expense trend and the balance forecast, fed directly from the aggregated arrays.
+    Uses the object-oriented Figure API (not pyplot), so it is safe to call
+    from a worker thread; the caller embeds the figure in a Tk canvas afterwards.
+
+    Args:
+        series (dict): Output of compute_report_series().
+
+    Returns:
+        matplotlib.figure.Figure: The laid-out report figure.
+    """
+    # Pie and bar chart side by side, trend and forecast across the bottom
+    fig = Figure(figsize=(10, 11))
+    FigureCanvasAgg(fig)  # Off-screen canvas so the layout can be computed here
+    grid = fig.add_gridspec(3, 2)
+    ax1 = fig.add_subplot(grid[0, 0])
+    ax2 = fig.add_subplot(grid[0, 1])
+    ax3 = fig.add_subplot(grid[1, :])
+    ax4 = fig.add_subplot(grid[2, :])
+
+    _draw_categories(ax1, series['categories'])
+    _draw_monthly(ax2, series['monthly_labels'], series['monthly_values'])
+    _draw_trend(ax3, series['trend'])
+    _draw_forecast(ax4, series['forecast'])
+
+    fig.tight_layout()  # Adjust layout to prevent overlap
+    return fig
+
+
+@instrumented
+def update_report_figure(fig, old, new):
+    """
+    Bring an existing report figure up to date with new series, touching only
+    the panels whose data changed. When the months are unchanged, bar heights
+    and line data are updated in place instead of redrawing the axes.
+
+    Returns:
+        bool: True if anything in the figure changed.
+    """
+    ax1, ax2, ax3, ax4 = fig.axes
+    changed = False
+
+    if new['categories'] != old['categories']:
+        _draw_categories(ax1, new['categories'])
+        changed = True
+
+    if list(new['monthly_values']) != list(old['monthly_values']) or new['monthly_labels'] != old['monthly_labels']:
+        if new['monthly_labels'] == old['monthly_labels'] and ax2.patches:
+            for bar, value in zip(ax2.patches, new['monthly_values']):
+                bar.set_height(cents_to_dollars(value))
+            ax2.relim()
+            ax2.autoscale_view()
+        else:
+            _draw_monthly(ax2, new['monthly_labels'], new['monthly_values'])
+        changed = True
+
+    old_trend, new_trend = old['trend'], new['trend']
+    if any(list(new_trend[k]) != list(old_trend[k]) for k in ('labels', 'income', 'expense', 'net_average')):
+        if new_trend['labels'] == old_trend['labels'] and len(ax3.lines) == 3:
+            for line, key in zip(ax3.lines, ('income', 'expense', 'net_average')):
+                line.set_ydata(cents_to_dollars(new_trend[key]))
+            ax3.relim()
+            ax3.autoscale_view()
+        else:
+            _draw_trend(ax3, new_trend)
+        changed = True
+
+    old_forecast, new_forecast = old['forecast'], new['forecast']
+    if new_forecast != old_forecast:
+        if new_forecast['labels'] == old_forecast['labels'] and ax4.lines:
+            ax4.lines[0].set_ydata([cents_to_dollars(c) for c in new_forecast['balance']])
+            ax4.relim()
+            ax4.autoscale_view()
+        else:
+            _draw_forecast(ax4, new_forecast)
+        changed = True
+
+    return changed
+
+
+@instrumented
+def prepare_report(params, cached_version, has_figure, forecast=None):
+    """
+    Worker-thread half of a report request.
+    Skips all work when the cached report is still current; otherwise computes the
+    series, and builds a new figure only when there is no cached one to update.
+
+    Args:
+        params (tuple): (date_from, date_to) of the report.
+        cached_version: Ledger version of the cached report, or None.
+        has_figure (bool): Whether the cache holds a figure for these params.
+        forecast (dict, optional): The projected-balance series, see MoneyManager.get_forecast().
+
+    Returns:
+        dict: 'params', 'version', 'series' (None if unchanged) and 'figure' (None unless newly built).
+    """
+    # The forecast also moves with the date and the recurring rules, so it is part of the version
+    version = (fetch_ledger_version(), forecast)
+    if version == cached_version:
+        return {'params': params, 'version': version, 'series': None, 'figure': None}
+    series = compute_report_series(*params, forecast=forecast)
+    figure = None if has_figure else build_report_figure(series)
+    return {'params': params, 'version': version, 'series': series, 'figure': figure}
+
+
+class ReportCache:
+    """
+    LRU cache of rendered reports, keyed by report parameters.
+    Each entry holds the ledger version it was built from, the aggregated series and
+    the figure. Used from the Tk thread only; prepare_report() does the heavy work.
+    """
+
+    def __init__(self, max_entries=REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # params -> {'version', 'series', 'figure'}
+
+    def get(self, params):
+        # Return the cached entry for params (marking it most recently used), or None
+        entry = self._entries.get(params)
+        if entry is not None:
+            self._entries.move_to_end(params)
+        return entry
+
+    def apply(self, update):
+        """
+        Merge the result of prepare_report() into the cache and return the figure to show.
+        Returns None if the entry the update was based on has been evicted meanwhile.
+        """
+        params = update['params']
+        entry = self._entries.get(params)
+        if entry is None and update['figure'] is None and update['series'] is None:
+            return None
+        if update['figure'] is not None or entry is None:
+            figure = update['figure'] or build_report_figure(update['series'])
+            entry = self._entries[params] = {'version': update['version'], 'series': update['series'], 'figure': figure}
+        elif update['series'] is not None:
+            update_report_figure(entry['figure'], entry['series'], update['series'])
+            entry['series'] = update['series']
+            entry['version'] = update['version']
+        self._entries.move_to_end(params)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry['figure']
@@ -0,0 +1,84 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from database import (
+    database_path, fetch_shards, fetch_balance, fetch_account_balances,
+    fetch_expense_by_category, fetch_monthly_expenses
+)
+from profiling import instrumented
+
+# Queries over the live ledger and its shard files (see database.shard_transactions).
+# Every file has its own pooled connection, and sqlite3 releases the GIL while a query
+# runs, so the files are read in parallel threads and their partial aggregates merged.
+
+SHARD_WORKERS = 4  # Files queried at the same time
+
+_executor = None
+
+
+def ledger_files(date_from=None, date_to=None):
+    """
+    The current ledger file followed by the shard files that may hold rows between
+    two ISO dates (inclusive); shards entirely outside the range are skipped.
+    """
+    paths = [database_path()]
+    for shard in fetch_shards():
+        if not shard['rows']:
+            continue
+        if date_from and shard['last_date'] < date_from:
+            continue
+        if date_to and shard['first_date'] > date_to:
+            continue
+        paths.append(shard['path'])
+    return paths
+
+
+def map_files(fn, paths):
+    """
+    Call fn(path) for every path, in parallel when there is more than one.
+
+    Returns:
+        list: The results, in the order of 'paths'.
+    """
+    global _executor
+    if len(paths) == 1:
+        return [fn(paths[0])]
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+    return list(_executor.map(fn, paths))
+
+
+@instrumented
+def total_balance():
+    """Balance in cents over the ledger and all its shards."""
+    return sum(map_files(lambda path: fetch_balance(path=path), ledger_files()))
+
+
+@instrumented
+def account_balances():
+    """Balance in cents of every account, over the ledger and all its shards."""
+    totals = Counter()
+    for partial in map_files(fetch_account_balances, ledger_files()):
+        totals.update(partial)
+    return dict(sorted(totals.items()))
+
+
+@instrumented
+def expense_by_category(month=None):
+    """Total expenses in cents per category (only in a 'YYYY-MM' month, if given), over the ledger and all its shards."""
+    if month is not None:
+        paths = ledger_files(f"{month}-01", f"{month}-31")
+    else:
+        paths = ledger_files()
+    totals = Counter()
+    for partial in map_files(lambda path: fetch_expense_by_category(path, month), paths):
+        totals.update(partial)
+    return dict(totals)
+
+
+@instrumented
+def monthly_expenses():
+    """Total expenses in cents per 'MM-YYYY' month in chronological order, over the ledger and all its shards."""
+    totals = Counter()
+    for partial in map_files(fetch_monthly_expenses, ledger_files()):
+        totals.update(partial)
+    return dict(sorted(totals.items(), key=lambda item: (item[0][3:], item[0][:2])))
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import money_manager  # noqa: E402
+from money_manager import MoneyManager  # noqa: E402
+
+
+class ChangeFeedTest(unittest.TestCase):
+    """Changes committed by another connection reach MoneyManager's cache exactly once."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ledger.db")
+        database.set_database(self.path)
+        database.initialize_db()
+        self.other = sqlite3.connect(self.path, isolation_level=None)  # Stands in for another process
+
+    def tearDown(self):
+        self.other.close()
+        database.close_connection()
+        self.tmp.cleanup()
+
+    def assert_matches_database(self, manager):
+        fresh = MoneyManager()
+        self.assertEqual(manager.get_balance(), fresh.get_balance())
+        self.assertEqual(manager.get_expense_by_category(), fresh.get_expense_by_category())
+        self.assertEqual(manager.count_transactions(), fresh.count_transactions())
+
+    def test_commit_between_log_and_row_reads(self):
+        manager = MoneyManager()
+        manager.add_expense(100, "Lunch", "Food")
+        trans_id = manager.get_transactions()[0]['id']
+        self.assertEqual(manager.get_balance(), -100)
+        self.assertEqual(manager.get_expense_by_category(), {'Food': 100})
+
+        self.other.execute("UPDATE transactions SET amount_cents = 200 WHERE id = ?", (trans_id,))
+        read_rows = database.fetch_transactions_by_ids
+
+        def racing_read(trans_ids):
+            # Another writer commits after the change_log was read, before the rows are
+            self.other.execute("UPDATE transactions SET amount_cents = 300 WHERE id = ?", (trans_id,))
+            return read_rows(trans_ids)
+
+        with mock.patch.object(database, "fetch_transactions_by_ids", racing_read):
+            changes = manager.poll_changes()
+        self.assertEqual(changes['updated'], {trans_id})
+        self.assertEqual(manager._balance, -200)  # The racing commit wasn't in the snapshot
+
+        manager.poll_changes()
+        self.assertEqual(manager.get_balance(), -300)
+        self.assertEqual(manager.get_expense_by_category(), {'Food': 300})
+        self.assert_matches_database(manager)
+
+    def test_commit_before_cold_load(self):
+        manager = MoneyManager()
+        manager.add_income(500, "Pay", "Salary")
+        self.assertIsNone(manager.poll_changes())
+        load_balance = money_manager.total_balance
+        loads = []
+
+        def racing_load():
+            # Another writer commits after the last sync, before the balance is first read
+            loads.append(1)
+            if len(loads) > 1:
+                return load_balance()
+            self.other.execute('''
+                INSERT INTO transactions (type, amount_cents, name, category_id, date)
+                VALUES ('income', 250, 'Bonus', (SELECT id FROM categories WHERE name = 'Salary'), '2024-01-01')
+            ''')
+            return load_balance()
+
+        with mock.patch.object(money_manager, "total_balance", racing_load):
+            manager.get_balance()
+        manager.poll_changes()
+        self.assertEqual(manager.get_balance(), 1000)
+        self.assert_matches_database(manager)
+
+    def test_own_writes_are_not_applied_twice(self):
+        manager = MoneyManager()
+        manager.get_balance()
+        manager.add_income(1000, "Pay", "Salary")
+        self.assertIsNone(manager.poll_changes())
+        self.other.execute('''
+            INSERT INTO transactions (type, amount_cents, name, category_id, date)
+            VALUES ('expense', 250, 'Coffee', (SELECT id FROM categories WHERE name = 'Salary'), '2024-01-01')
+        ''')
+        changes = manager.poll_changes()
+        self.assertEqual(len(changes['inserted']), 1)
+        self.assertEqual(manager.get_balance(), 750)
+        self.assert_matches_database(manager)
+
+
+if __name__ == "__main__":
+    unittest.main()